@@ -1,18 +1,26 @@
 # app.py
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-from utils.database import get_db
+from utils.database import get_db, engine, close_request_db, start_request_queries, finish_request_queries
 from flask_restful import Api, Resource
 from routes.datasets import Datasets
 from routes.clinical_data import ClinicalData
 from routes.summary import Summary
-from routes.analysis import Analysis
-from routes.heatmap import Heatmap
+from routes.analysis import Analysis, AnalysisBatch, AnalysisJobs, AnalysisJob
+from routes.heatmap import Heatmap, HeatmapLabels, HeatmapTiles
+from routes.pool_status import PoolStatus, QueryStatus
+from routes.metrics import Metrics
+from utils import instrumentation
 from werkzeug.exceptions import HTTPException
+from utils.summary_stats import ensure_snapshot_table
 
 app = Flask(__name__)
 api = Api(app)
 CORS(app)  # Enable CORS for all routes
+app.teardown_appcontext(close_request_db)  # release each request's session
+app.before_request(start_request_queries)  # per-request query counts (utils/database.py)
+app.after_request(finish_request_queries)
+instrumentation.init_app(app, api)  # Server-Timing header and /metrics
 
 # Sample dataset information
 datasets = [
@@ -99,6 +107,16 @@ api.add_resource(Datasets, '/api/datasets')
 api.add_resource(ClinicalData, '/api/datasets/<dataset_name>/clinical')
 api.add_resource(Summary, '/api/datasets/<dataset_name>/summary')
 api.add_resource(Analysis, '/api/datasets/<dataset_name>/analysis')
+api.add_resource(AnalysisBatch, '/api/datasets/<dataset_name>/analysis/batch')
+api.add_resource(AnalysisJobs, '/api/datasets/<dataset_name>/analysis/jobs')
+api.add_resource(AnalysisJob, '/api/datasets/<dataset_name>/analysis/jobs/<job_id>')
 api.add_resource(Heatmap, '/api/datasets/heatmap')
+api.add_resource(HeatmapLabels, '/api/datasets/heatmap/labels')
+api.add_resource(HeatmapTiles, '/api/datasets/<dataset_name>/heatmap/tiles')
+api.add_resource(PoolStatus, '/api/db/pool')
+api.add_resource(QueryStatus, '/api/db/queries')
+api.add_resource(Metrics, '/metrics')
 if __name__ == '__main__':
+    # The summary route only reads and writes snapshots; create their table once here
+    ensure_snapshot_table(engine)
     app.run(debug=True, port=4000)
\ No newline at end of file
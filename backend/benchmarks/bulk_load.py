@@ -0,0 +1,94 @@
+"""Rows/s of each bulk-load strategy against the original to_sql path.
+
+    python -m benchmarks.bulk_load --db-url sqlite:////tmp/bench.db --rows 200000
+    python -m benchmarks.bulk_load --db-url mysql+pymysql://root:@localhost/bench --shape matrix
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, MetaData, text
+
+os.makedirs('logs', exist_ok=True)  # dataloader logs to ./logs/data_loader.log
+from dataloader import create_dynamic_table_class
+from utils.bulk_load import get_loader, LOADERS, DIALECT_LOADERS
+
+
+def mutations_frame(rows, seed=0):
+    """Mutation-like rows: short strings, positions and a few floats with gaps"""
+    rng = np.random.default_rng(seed)
+    genes = np.array([f"GENE{i}" for i in range(2000)])
+    df = pd.DataFrame({
+        'Hugo_Symbol': genes[rng.integers(0, len(genes), rows)],
+        'Chromosome': rng.integers(1, 23, rows).astype(str),
+        'Start_Position': rng.integers(1, 250_000_000, rows),
+        'Variant_Classification': rng.choice(['Missense_Mutation', 'Silent', 'Nonsense_Mutation'], rows),
+        'Tumor_Sample_Barcode': [f"TCGA-{i % 5000:04d}-01" for i in range(rows)],
+        't_alt_count': rng.integers(0, 200, rows).astype(float),
+        'vaf': rng.random(rows),
+    })
+    df.loc[rng.random(rows) < 0.1, 'vaf'] = np.nan
+    return df
+
+
+def matrix_frame(rows, samples=500, seed=0):
+    """Methylation-like rows: a symbol plus one float column per sample"""
+    rng = np.random.default_rng(seed)
+    df = pd.DataFrame(rng.random((rows, samples)), columns=[f"TCGA_{i:04d}" for i in range(samples)])
+    df.insert(0, 'Hugo_Symbol', [f"GENE{i}" for i in range(rows)])
+    return df
+
+
+def run(engine, df, strategy):
+    table_name = f"bench_{strategy}"
+    with engine.begin() as conn:
+        conn.execute(text(f"DROP TABLE IF EXISTS {table_name}"))
+    metadata = MetaData()
+    frame = df.copy()
+    create_dynamic_table_class(table_name, frame, metadata)
+    metadata.create_all(engine)
+
+    start = time.perf_counter()
+    get_loader(engine, strategy).load(engine, frame, table_name)
+    seconds = time.perf_counter() - start
+
+    with engine.begin() as conn:
+        count = conn.execute(text(f"SELECT COUNT(*) FROM {table_name}")).scalar()
+        conn.execute(text(f"DROP TABLE {table_name}"))
+    assert count == len(df), f"{strategy} loaded {count} of {len(df)} rows"
+    return {"strategy": strategy, "rows": len(df), "seconds": round(seconds, 3),
+            "rows_per_s": round(len(df) / seconds)}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db-url', default='sqlite:////tmp/bulk_load_bench.db')
+    parser.add_argument('--rows', type=int, default=100_000)
+    parser.add_argument('--shape', choices=['mutations', 'matrix'], default='mutations')
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    engine = create_engine(args.db_url, connect_args={'local_infile': True} if args.db_url.startswith('mysql') else {})
+    df = mutations_frame(args.rows) if args.shape == 'mutations' else matrix_frame(args.rows)
+
+    # The baseline, the generic strategy and the dialect's own fast path
+    strategies = ['to_sql', 'multi_row_insert']
+    if engine.dialect.name in DIALECT_LOADERS:
+        strategies.append(DIALECT_LOADERS[engine.dialect.name].name)
+
+    results = []
+    for strategy in strategies:
+        result = run(engine, df, strategy)
+        results.append(result)
+        print(f"{strategy:20s} {result['seconds']:8.2f}s {result['rows_per_s']:10d} rows/s")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({"db": engine.dialect.name, "shape": args.shape, "results": results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""Latency of the dataloader and the API endpoints on a synthetic dataset.
+
+    python -m benchmarks.endpoints --samples 1000 --genes 2000 --output bench.json
+    python -m benchmarks.endpoints --db-url mysql+pymysql://root:@localhost/bench --baseline bench.json
+
+Generates a dataset (benchmarks.synthetic_dataset) unless --datasets-dir points
+at one, loads it with the dataloader, then calls each endpoint through the
+Flask test client. Reports p50/p95 latency per case and the peak RSS after
+each phase, and writes them as JSON for comparing runs.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import numpy as np
+
+DATASET = 'brca_tcga_pub2015'  # the heatmap routes read this dataset
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process and of its finished children (loader workers)"""
+    scale = 1 if sys.platform == 'darwin' else 1024  # ru_maxrss is bytes on macOS, KiB on Linux
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+    return {"self": round(own / 2 ** 20, 1), "children": round(children / 2 ** 20, 1)}
+
+
+def cases(dataset_name):
+    """(name, method, url, json body, setup) for every benchmarked request"""
+    analysis = f'/api/datasets/{dataset_name}/analysis'
+    features = ['Age', 'Gender', 'Race', 'Tumor Histology', 'Cancer State']
+    result = [
+        ('summary', 'get', f'/api/datasets/{dataset_name}/summary', None, None),
+        ('summary_compute', 'get', f'/api/datasets/{dataset_name}/summary', None, 'drop_snapshot'),
+        ('clinical', 'get', f'/api/datasets/{dataset_name}/clinical', None, None),
+    ]
+    for feature in features:
+        result.append((f"analysis_methylation_{feature.lower().replace(' ', '_')}", 'post', analysis,
+                       {'type': 'methylation', 'gene': 'TP53', 'clinicalFeature': feature}, None))
+    result += [
+        ('analysis_survival', 'post', analysis, {'type': 'survival', 'gene': 'TP53', 'stratifyBy': 'Age'}, None),
+        ('analysis_survival_mutation', 'post', analysis,
+         {'type': 'survival', 'gene': 'TP53', 'stratifyBy': 'mutation'}, None),
+        ('analysis_correlation_pair', 'post', analysis, {'type': 'correlation', 'gene': 'TP53', 'gene2': 'BRCA1'}, None),
+        ('analysis_correlation_top', 'post', analysis, {'type': 'correlation', 'gene': 'TP53', 'topK': 50}, None),
+        ('analysis_differential', 'post', analysis,
+         {'type': 'differential', 'groupA': {'attribute': 'Tumor Histology', 'value': 'WITH TUMOR'}}, None),
+        ('analysis_batch', 'post', f'{analysis}/batch',
+         {'genes': ['TP53', 'PIK3CA', 'CDH1', 'GATA3', 'MAP3K1', 'BRCA1', 'BRCA2', 'PTEN', 'AKT1', 'ERBB2']}, None),
+        ('heatmap', 'get', '/api/datasets/heatmap', None, None),
+        ('heatmap_genes_clustered', 'get', '/api/datasets/heatmap?genes=TP53,PIK3CA,CDH1,GATA3,BRCA1&cluster=both',
+         None, None),
+        ('heatmap_tile', 'get', f'/api/datasets/{dataset_name}/heatmap/tiles?level=0&format=int8', None, None),
+    ]
+    return result
+
+
+def percentile(values, q):
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def run_case(client, method, url, body, setup, repeat):
+    """Cold (first) and warm latencies in ms of one request; setup runs untimed before each call"""
+    latencies, statuses = [], {}
+    for _ in range(repeat + 1):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        response = getattr(client, method)(url, json=body) if body is not None else getattr(client, method)(url)
+        response.get_data()
+        latencies.append((time.perf_counter() - start) * 1000)
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    warm = latencies[1:]
+    return {
+        "cold_ms": round(latencies[0], 2),
+        "p50_ms": percentile(warm, 50),
+        "p95_ms": percentile(warm, 95),
+        "mean_ms": round(float(np.mean(warm)), 2) if warm else None,
+        "n": len(warm),
+        "statuses": {str(code): count for code, count in statuses.items()},
+    }
+
+
+def load(dataset_path, dataset_name):
+    """Load the dataset with the dataloader, register it and build its summary snapshot"""
+    os.makedirs('logs', exist_ok=True)  # dataloader logs to ./logs/data_loader.log
+    import dataloader
+    from sqlalchemy import MetaData, Table, Column, String, select
+    from utils import load_manifest
+
+    engine = dataloader.get_engine()
+    load_manifest.ensure_manifest_table(engine)
+    start = time.perf_counter()
+    timings = [timing for timing in dataloader.load_dataset(engine, dataset_path, dataset_name) if timing]
+    load_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    dataloader.build_summary_snapshots(engine, [dataset_name])
+    snapshot_seconds = time.perf_counter() - start
+
+    # The routes only serve datasets listed in the dataset table (utils/init_db.py)
+    dataset = Table('dataset', MetaData(), Column('name', String(255), primary_key=True),
+                    Column('type', String(255), nullable=False))
+    dataset.create(engine, checkfirst=True)
+    with engine.begin() as conn:
+        if conn.execute(select(dataset.c.name).where(dataset.c.name == dataset_name)).first() is None:
+            conn.execute(dataset.insert().values(name=dataset_name, type='Synthetic'))
+    engine.dispose()
+
+    return {
+        "seconds": round(load_seconds, 3),
+        "snapshot_seconds": round(snapshot_seconds, 3),
+        "files": [{"file": os.path.basename(t.file), "rows": t.rows, "seconds": round(t.seconds, 3)}
+                  for t in timings],
+    }
+
+
+def compare(results, baseline_path):
+    """Print p50/p95 against an earlier run"""
+    with open(baseline_path) as f:
+        baseline = json.load(f)["endpoints"]
+    print(f"\n{'case':36s} {'p50 base':>10s} {'p50 now':>10s} {'p95 base':>10s} {'p95 now':>10s}")
+    for name, now in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        print(f"{name:36s} {before['p50_ms']:10.2f} {now['p50_ms']:10.2f} {before['p95_ms']:10.2f} {now['p95_ms']:10.2f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db-url', help="database to load into (default: a new SQLite file)")
+    parser.add_argument('--datasets-dir', help="existing datasets directory (default: generate one)")
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--genes', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=20, help="timed calls per case after the cold one")
+    parser.add_argument('--skip-load', action='store_true', help="the database already holds the dataset")
+    parser.add_argument('--only', help="comma-separated case names to run")
+    parser.add_argument('--output', help="write the results as JSON to this file")
+    parser.add_argument('--baseline', help="JSON of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix='bcancer_bench_')
+    datasets_dir = args.datasets_dir or os.path.join(workdir, 'datasets')
+    db_url = args.db_url or f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    # Read by utils.config and dataloader.get_engine, so set before importing either
+    os.environ['DATASETS_DIR'] = datasets_dir
+    os.environ['DATABASE_URL'] = db_url
+
+    report = {"db": db_url.split(':')[0], "samples": args.samples, "genes": args.genes, "repeat": args.repeat,
+              "peak_rss_mb": {}}
+    if not args.datasets_dir:
+        from benchmarks.synthetic_dataset import generate
+        start = time.perf_counter()
+        generate(datasets_dir, DATASET, args.samples, args.genes)
+        report["generate_seconds"] = round(time.perf_counter() - start, 3)
+        print(f"Generated {args.samples} samples x {args.genes} genes in {report['generate_seconds']:.1f}s")
+    report["peak_rss_mb"]["generate"] = peak_rss_mb()
+
+    if not args.skip_load:
+        report["load"] = load(os.path.join(datasets_dir, DATASET), DATASET)
+        print(f"Loaded in {report['load']['seconds']:.1f}s, snapshot in {report['load']['snapshot_seconds']:.1f}s")
+    report["peak_rss_mb"]["load"] = peak_rss_mb()
+
+    from app import app
+    from utils.database import engine
+    from utils.summary_stats import summary_snapshot
+
+    def drop_snapshot():
+        with engine.begin() as conn:
+            conn.execute(summary_snapshot.delete().where(summary_snapshot.c.dataset == DATASET))
+
+    setups = {'drop_snapshot': drop_snapshot}
+    only = set(args.only.split(',')) if args.only else None
+    client = app.test_client()
+    results = {}
+    for name, method, url, body, setup in cases(DATASET):
+        if only and name not in only:
+            continue
+        results[name] = run_case(client, method, url, body, setups.get(setup), args.repeat)
+        result = results[name]
+        print(f"{name:36s} cold {result['cold_ms']:9.1f}ms  p50 {result['p50_ms']:9.1f}ms  "
+              f"p95 {result['p95_ms']:9.1f}ms  {result['statuses']}")
+    report["endpoints"] = results
+    report["peak_rss_mb"]["endpoints"] = peak_rss_mb()
+    print(f"Peak RSS: {report['peak_rss_mb']['endpoints']['self']} MB")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.baseline:
+        compare(results, args.baseline)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
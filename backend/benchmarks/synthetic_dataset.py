@@ -0,0 +1,213 @@
+"""Write a synthetic cBioPortal-style dataset directory for benchmarks.
+
+    python -m benchmarks.synthetic_dataset --out /tmp/bench_datasets --samples 10000 --genes 20000
+
+The layout is what dataloader.load_dataset expects: clinical patient and
+sample files (with cBioPortal placeholders such as "[Not Available]"), a
+mutations MAF, methylation and mRNA matrices, GISTIC peaks and case lists,
+plus the datasets.csv index next to the dataset directory.
+"""
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# Real symbols first so the default gene lists of the routes find data
+KNOWN_GENES = ['TP53', 'PIK3CA', 'CDH1', 'GATA3', 'MAP3K1', 'BRCA1', 'BRCA2', 'PTEN', 'AKT1', 'ERBB2',
+               'ESR1', 'FOXA1', 'KMT2C', 'NCOR1', 'RUNX1', 'CBFB', 'TBX3', 'NF1', 'RB1', 'MYC']
+
+SENTINELS = ['[Not Available]', '[Not Applicable]', '[Unknown]', '[Discrepancy]']
+
+# Matrix rows written per to_csv call, to bound memory at large scale
+WRITE_CHUNK_GENES = 1000
+
+# Low-rank structure so genes correlate and groups differ, as in real profiles
+LATENT_FACTORS = 8
+
+
+def gene_symbols(n_genes):
+    return (KNOWN_GENES + [f"GENE{i}" for i in range(n_genes)])[:n_genes]
+
+
+def with_sentinels(values, rng, rate=0.05, sentinels=SENTINELS[:1]):
+    """values as objects with a fraction replaced by cBioPortal placeholders"""
+    values = np.asarray(values, dtype=object)
+    mask = rng.random(len(values)) < rate
+    values[mask] = rng.choice(sentinels, mask.sum())
+    return values
+
+
+def clinical_frames(n_samples, rng):
+    """(patients, samples); about one patient in twenty has a second, metastatic sample"""
+    n_patients = max(1, int(round(n_samples / 1.05)))
+    patients = [f"SYN-{i:06d}" for i in range(n_patients)]
+    owner = np.concatenate([np.arange(n_patients), rng.choice(n_patients, n_samples - n_patients, replace=False)])
+    suffix = np.where(np.arange(n_samples) < n_patients, '01', '06')
+    sample_ids = [f"{patients[p]}-{s}" for p, s in zip(owner, suffix)]
+
+    deceased = rng.random(n_patients) < 0.15
+    recurred = rng.random(n_patients) < 0.2
+    followup = rng.gamma(2.0, 20.0, n_patients)
+    patient = pd.DataFrame({
+        'PATIENT_ID': patients,
+        'AGE': with_sentinels(rng.integers(26, 90, n_patients), rng, 0.01),
+        'SEX': rng.choice(['Female', 'Male'], n_patients, p=[0.98, 0.02]),
+        'RACE': with_sentinels(rng.choice(['WHITE', 'BLACK OR AFRICAN AMERICAN', 'ASIAN'], n_patients,
+                                          p=[0.75, 0.17, 0.08]), rng, 0.08),
+        'ETHNICITY': with_sentinels(rng.choice(['NOT HISPANIC OR LATINO', 'HISPANIC OR LATINO'], n_patients,
+                                               p=[0.95, 0.05]), rng, 0.15, SENTINELS),
+        'TUMOR_STATUS': with_sentinels(rng.choice(['TUMOR FREE', 'WITH TUMOR'], n_patients, p=[0.85, 0.15]), rng),
+        'AJCC_PATHOLOGIC_TUMOR_STAGE': with_sentinels(
+            rng.choice(['Stage I', 'Stage IIA', 'Stage IIB', 'Stage IIIA', 'Stage IIIC', 'Stage IV'], n_patients,
+                       p=[0.17, 0.33, 0.23, 0.15, 0.07, 0.05]), rng, 0.03),
+        'AJCC_METASTASIS_PATHOLOGIC_PM': rng.choice(['M0', 'MX', 'M1'], n_patients, p=[0.8, 0.18, 0.02]),
+        'AJCC_STAGING_EDITION': with_sentinels(rng.choice(['5th', '6th', '7th'], n_patients), rng),
+        'PHARMACEUTICAL_TX_ADJUVANT': with_sentinels(rng.choice(['YES', 'NO'], n_patients), rng, 0.2, SENTINELS),
+        'DAYS_TO_BIRTH': with_sentinels(-rng.integers(26 * 365, 90 * 365, n_patients), rng, 0.01),
+        'DAYS_TO_DEATH': np.where(deceased, rng.integers(30, 4000, n_patients).astype(object), '[Not Applicable]'),
+        'DAYS_TO_LAST_FOLLOWUP': with_sentinels(np.round(followup * 30.4).astype(int), rng, 0.05),
+        'OS_STATUS': np.where(deceased, '1:DECEASED', '0:LIVING'),
+        'OS_MONTHS': with_sentinels(np.round(followup, 2), rng, 0.01),
+        'DFS_STATUS': with_sentinels(np.where(recurred, '1:Recurred/Progressed', '0:DiseaseFree'), rng, 0.1),
+        'DFS_MONTHS': with_sentinels(np.round(followup * rng.uniform(0.3, 1.0, n_patients), 2), rng, 0.1),
+    })
+    sample = pd.DataFrame({
+        'PATIENT_ID': [patients[p] for p in owner],
+        'SAMPLE_ID': sample_ids,
+        'SAMPLE_TYPE': np.where(suffix == '01', 'Primary', 'Metastasis'),
+        'CANCER_TYPE': 'Breast Cancer',
+        'CANCER_TYPE_DETAILED': rng.choice(['Breast Invasive Ductal Carcinoma', 'Breast Invasive Lobular Carcinoma',
+                                            'Breast Mixed Ductal and Lobular Carcinoma'], n_samples, p=[0.7, 0.2, 0.1]),
+        'ONCOTREE_CODE': rng.choice(['IDC', 'ILC', 'MDLC'], n_samples, p=[0.7, 0.2, 0.1]),
+        'DAYS_TO_COLLECTION': with_sentinels(rng.integers(0, 700, n_samples), rng, 0.1),
+    })
+    return patient, sample
+
+
+def mutations_frame(sample_ids, genes, per_sample, rng):
+    """MAF rows; a few driver genes are hit far more often than the rest"""
+    n = int(len(sample_ids) * per_sample)
+    weights = 1.0 / np.arange(1, len(genes) + 1) ** 1.1
+    weights /= weights.sum()
+    gene = rng.choice(len(genes), n, p=weights)
+    start = rng.integers(1, 240_000_000, n)
+    classification = rng.choice(['Missense_Mutation', 'Silent', 'Nonsense_Mutation', 'Frame_Shift_Del',
+                                 'Splice_Site', 'In_Frame_Del'], n, p=[0.55, 0.2, 0.08, 0.08, 0.05, 0.04])
+    return pd.DataFrame({
+        'Hugo_Symbol': np.asarray(genes)[gene],
+        'Entrez_Gene_Id': gene + 1,
+        'Center': 'synthetic',
+        'NCBI_Build': 'GRCh37',
+        'Chromosome': rng.integers(1, 23, n).astype(str),
+        'Start_Position': start,
+        'End_Position': start + rng.integers(0, 3, n),
+        'Strand': '+',
+        'Variant_Classification': classification,
+        'Variant_Type': np.where(np.isin(classification, ['Frame_Shift_Del', 'In_Frame_Del']), 'DEL', 'SNP'),
+        'Reference_Allele': rng.choice(list('ACGT'), n),
+        'Tumor_Seq_Allele2': rng.choice(list('ACGT'), n),
+        'Tumor_Sample_Barcode': np.asarray(sample_ids)[rng.integers(0, len(sample_ids), n)],
+        'HGVSp_Short': [f"p.X{pos % 1000}Y" for pos in start],
+        't_ref_count': rng.integers(5, 300, n),
+        't_alt_count': rng.integers(2, 150, n),
+    })
+
+
+def write_matrix(path, genes, sample_ids, rng, kind):
+    """Gene x sample matrix CSV; 'beta' gives methylation values in [0, 1], 'zscore' mRNA z-scores"""
+    factors = rng.normal(size=(LATENT_FACTORS, len(sample_ids)))
+    with open(path, 'w') as f:
+        f.write(','.join(['Hugo_Symbol', 'Entrez_Gene_Id'] + list(sample_ids)) + '\n')
+        for start in range(0, len(genes), WRITE_CHUNK_GENES):
+            block_genes = genes[start:start + WRITE_CHUNK_GENES]
+            loadings = rng.normal(scale=0.6, size=(len(block_genes), LATENT_FACTORS))
+            values = loadings @ factors + rng.normal(size=(len(block_genes), len(sample_ids)))
+            if kind == 'beta':
+                values = 1 / (1 + np.exp(-values))
+            values[rng.random(values.shape) < 0.01] = np.nan
+            block = pd.DataFrame(values, columns=sample_ids)
+            block.insert(0, 'Entrez_Gene_Id', np.arange(start, start + len(block_genes)) + 1)
+            block.insert(0, 'Hugo_Symbol', block_genes)
+            block.to_csv(f, header=False, index=False, float_format='%.4f')
+
+
+def gistic_frame(genes, rng, peaks=40):
+    peak_genes = [rng.choice(genes, rng.integers(1, 20)) for _ in range(peaks)]
+    return pd.DataFrame({
+        'cytoband': [f"{rng.integers(1, 23)}{rng.choice(['p', 'q'])}{rng.integers(11, 36)}.{rng.integers(1, 4)}"
+                     for _ in range(peaks)],
+        'q_value': 10.0 ** -rng.uniform(1, 30, peaks),
+        'residual_q_value': 10.0 ** -rng.uniform(1, 20, peaks),
+        'wide_peak_boundaries': [f"chr{rng.integers(1, 23)}:{start}-{start + 500000}"
+                                 for start in rng.integers(1, 200_000_000, peaks)],
+        'genes_in_wide_peak': [','.join(g) for g in peak_genes],
+        'n_genes_in_region': [len(g) + rng.integers(0, 30) for g in peak_genes],
+        'n_genes_in_peak': [len(g) for g in peak_genes],
+    })
+
+
+def write_case_list(path, dataset_name, suffix, name, sample_ids):
+    with open(path, 'w') as f:
+        f.write(f"cancer_study_identifier: {dataset_name}\n")
+        f.write(f"stable_id: {dataset_name}_{suffix}\n")
+        f.write(f"case_list_name: {name}\n")
+        f.write(f"case_list_description: {name} ({len(sample_ids)} samples)\n")
+        f.write("case_list_ids: " + '\t'.join(sample_ids) + '\n')
+
+
+def generate(out_dir, dataset_name, n_samples, n_genes, mutations_per_sample=40, seed=0):
+    """Write <out_dir>/<dataset_name>/ and <out_dir>/datasets.csv; returns the dataset path"""
+    rng = np.random.default_rng(seed)
+    path = os.path.join(out_dir, dataset_name)
+    os.makedirs(os.path.join(path, 'case_lists'), exist_ok=True)
+
+    patient, sample = clinical_frames(n_samples, rng)
+    patient.to_csv(os.path.join(path, 'data_clinical_patient.csv'), index=False)
+    sample.to_csv(os.path.join(path, 'data_clinical_sample.csv'), index=False)
+    sample_ids = sample['SAMPLE_ID'].tolist()
+    genes = gene_symbols(n_genes)
+
+    sequenced = [s for s in sample_ids if rng.random() < 0.95]
+    mutations_frame(sequenced, genes, mutations_per_sample, rng).to_csv(
+        os.path.join(path, 'data_mutations.csv'), index=False)
+    write_matrix(os.path.join(path, 'data_methylation_hm450.csv'), genes, sample_ids, rng, 'beta')
+    write_matrix(os.path.join(path, 'data_mrna_seq_v2_rsem_zscores_ref_all_samples.csv'), genes, sample_ids,
+                 rng, 'zscore')
+    gistic_frame(genes, rng).to_csv(os.path.join(path, 'data_gistic_genes_amp.csv'), index=False)
+    gistic_frame(genes, rng).to_csv(os.path.join(path, 'data_gistic_genes_del.csv'), index=False)
+
+    case_lists = os.path.join(path, 'case_lists')
+    write_case_list(os.path.join(case_lists, 'cases_all.txt'), dataset_name, 'all', 'All samples', sample_ids)
+    write_case_list(os.path.join(case_lists, 'cases_sequenced.txt'), dataset_name, 'sequenced',
+                    'Sequenced samples', sequenced)
+    write_case_list(os.path.join(case_lists, 'cases_methylation_hm450.txt'), dataset_name, 'methylation_hm450',
+                    'Samples with methylation data', sample_ids)
+    primary = sample.loc[sample['SAMPLE_TYPE'] == 'Primary', 'SAMPLE_ID'].tolist()
+    write_case_list(os.path.join(case_lists, 'cases_primary.txt'), dataset_name, 'primary',
+                    'Primary tumors', primary)
+
+    index_path = os.path.join(out_dir, 'datasets.csv')
+    names = pd.read_csv(index_path)['name'].tolist() if os.path.exists(index_path) else []
+    if dataset_name not in names:
+        pd.DataFrame({'name': names + [dataset_name]}).to_csv(index_path, index=False)
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default='/tmp/bench_datasets', help="datasets directory to write into")
+    # The heatmap routes read brca_tcga_pub2015, so that is the default name
+    parser.add_argument('--name', default='brca_tcga_pub2015')
+    parser.add_argument('--samples', type=int, default=1000)
+    parser.add_argument('--genes', type=int, default=2000)
+    parser.add_argument('--mutations-per-sample', type=float, default=40)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args(argv)
+
+    path = generate(args.out, args.name, args.samples, args.genes, args.mutations_per_sample, args.seed)
+    print(f"Wrote {args.samples} samples x {args.genes} genes to {path}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -4,12 +4,26 @@ import logging
 import sys
 import re
 import glob
-from sqlalchemy import create_engine, MetaData, Table, Column, Integer, Float, String, Text, Boolean
+import time
+import argparse
+import hashlib
+import multiprocessing
+from collections import namedtuple
+from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor
+from sqlalchemy import create_engine, inspect, MetaData, Table, Column, Integer, Float, String, Text, Boolean
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql import text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy_utils import database_exists, create_database
+from utils import array_store, load_manifest
+from utils.bulk_load import get_loader
+from utils.clinical_cache import SENTINEL_PATTERN
+from utils.columnar import convert_dataset, is_matrix_file
+from utils.heatmap_tiles import build_pyramids
+from utils.table_indexes import AUTO_INDEX_MAX_COLUMNS, build_indexes, declared_columns, index_columns
+from utils.summary_stats import compute_summary, ensure_snapshot_table, store_snapshot
 
 # Set up logging
 logging.basicConfig(
@@ -29,14 +43,30 @@ DB_HOST = 'localhost'
 DB_NAME = 'cancer_db'
 DB_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}/{DB_NAME}"
 
+# Parallel loading: number of worker processes (1 loads everything in this process)
+LOAD_WORKERS = int(os.environ.get('LOAD_WORKERS', 1))
+
+# Bulk-load strategy (see utils.bulk_load.LOADERS); empty picks the fastest for the dialect
+BULK_LOADER = os.environ.get('BULK_LOADER', '')
+
+# Streaming ingestion of .csv/.seg files (STREAM_LOAD=0 reads whole files as before).
+# Chunks hold about LOAD_CHUNK_CELLS values, so wide matrices get fewer rows per chunk.
+STREAM_LOAD = os.environ.get('STREAM_LOAD', '1') != '0'
+LOAD_CHUNK_CELLS = int(os.environ.get('LOAD_CHUNK_CELLS', 2_000_000))
+
+# Per-file load statistics reported at the end of a run
+FileTiming = namedtuple('FileTiming', ['dataset', 'file', 'rows', 'seconds'])
+
 # SQLAlchemy setup
 Base = declarative_base()
 
 
 def get_engine(db_url=None):
-    """Create and return a SQLAlchemy engine"""
+    """Create and return a SQLAlchemy engine (DATABASE_URL overrides the MySQL default)"""
     if db_url is None:
-        db_url = DB_URL
+        db_url = os.environ.get('DATABASE_URL') or DB_URL
+    if not db_url.startswith('mysql'):
+        return create_engine(db_url)
     
     # Create database if it doesn't exist
     # First connect to MySQL without specifying a database
@@ -49,8 +79,8 @@ def get_engine(db_url=None):
             conn.execute(text(f"CREATE DATABASE IF NOT EXISTS {DB_NAME}"))
         logger.info(f"Created database: {DB_NAME}")
     
-    # Create engine with the specified database
-    engine = create_engine(db_url)
+    # Create engine with the specified database; local_infile enables LOAD DATA LOCAL
+    engine = create_engine(db_url, connect_args={'local_infile': True})
     return engine
 
 
@@ -100,31 +130,178 @@ def create_dynamic_table_class(table_name, df, metadata):
     return Table(table_name, metadata, *table_columns)
 
 
+# Largest magnitude stored in an INTEGER column (MySQL INT is 32-bit)
+INTEGER_LIMIT = 2 ** 31 - 1
+
+
+def normalize_missing(df):
+    """Map cBioPortal placeholders such as "[Not Available]" to NULL and type numeric columns.
+
+    A text column whose remaining values are all numbers becomes nullable
+    Int64 (whole numbers within INTEGER_LIMIT) or float64, so it is stored as
+    INTEGER or FLOAT instead of VARCHAR. A column with no values left is float.
+    """
+    for col in df.columns:
+        if df[col].dtype != object:
+            continue
+        values = df[col].mask(df[col].astype(str).str.match(SENTINEL_PATTERN))
+        numeric = pd.to_numeric(values, errors='coerce')
+        present = numeric.dropna()
+        if len(present) == values.notna().sum():
+            if (present % 1 == 0).all() and (present.abs() <= INTEGER_LIMIT).all() and len(present):
+                numeric = numeric.astype('Int64')
+            values = numeric
+        df[col] = values
+    return df
+
+
+# Column kinds from narrowest to widest; a column only ever widens
+COLUMN_KINDS = ['boolean', 'integer', 'float', 'string', 'text']
+COLUMN_TYPES = {
+    'boolean': Boolean,
+    'integer': Integer,
+    'float': Float,
+    'string': String(255),
+    'text': Text,
+}
+
+
+def column_kind(series):
+    """Kind of a column as create_dynamic_table_class would type it"""
+    dtype = series.dtype
+    if pd.api.types.is_bool_dtype(dtype):
+        return 'boolean'
+    if pd.api.types.is_integer_dtype(dtype):
+        return 'integer'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'float'
+    return 'text' if series.astype(str).str.len().max() > 255 else 'string'
+
+
+class StreamingSchema:
+    """Column types inferred from a sample chunk, widened as later chunks require.
+
+    Only per-column kinds are kept (the running max-length statistic is folded
+    into string vs text), so memory does not grow with the file.
+    """
+
+    def __init__(self, sample):
+        self.kinds = {col: column_kind(sample[col]) for col in sample.columns}
+
+    def table(self, table_name, metadata):
+        columns = [Column('id', Integer, primary_key=True, autoincrement=True)]
+        columns += [Column(col, COLUMN_TYPES[kind]) for col, kind in self.kinds.items()]
+        return Table(table_name, metadata, *columns)
+
+    def widen(self, chunk):
+        """Update the kinds with chunk; returns {column: new kind} for columns that widened"""
+        widened = {}
+        for col in chunk.columns:
+            current = self.kinds[col]
+            if chunk[col].isna().all():
+                continue
+            kind = column_kind(chunk[col])
+            if COLUMN_KINDS.index(kind) > COLUMN_KINDS.index(current):
+                self.kinds[col] = widened[col] = kind
+        return widened
+
+
+def alter_column_types(engine, table_name, widened):
+    """Widen columns of an existing table (SQLite's dynamic typing needs no change)"""
+    if engine.dialect.name != 'mysql':
+        return
+    with engine.begin() as conn:
+        for col, kind in widened.items():
+            col_type = COLUMN_TYPES[kind].compile(dialect=engine.dialect)
+            conn.execute(text(f"ALTER TABLE `{table_name}` MODIFY `{col}` {col_type}"))
+            logger.info(f"Widened {table_name}.{col} to {col_type}")
+
+
+def columns_to_index(file_type, df):
+    """Index candidates of a loaded DataFrame (wide matrices only get their declared columns)"""
+    columns = df.columns
+    if len(columns) > AUTO_INDEX_MAX_COLUMNS:
+        columns = [col for col in declared_columns(file_type) if col in df.columns]
+    return index_columns(file_type, df, {col: column_kind(df[col]) for col in columns})
+
+
+def index_table(engine, table_name, columns):
+    """Post-load stage: build the indexes after the bulk insert; a failure does not fail the load"""
+    try:
+        build_indexes(engine, table_name, columns)
+    except SQLAlchemyError as e:
+        logger.error(f"Error indexing {table_name}: {e}")
+
+
+def stream_data_file(engine, file_path, table_name, create_turn=nullcontext):
+    """Load a CSV chunk by chunk: schema from the first chunk, table created once, then appended.
+
+    Peak memory is bounded by the chunk size, not the file size. Returns the rows
+    loaded, or None if a chunk failed to load.
+    """
+    file_type = os.path.basename(file_path).split('.')[0]
+    header = pd.read_csv(file_path, nrows=0)
+    chunk_rows = max(1000, LOAD_CHUNK_CELLS // max(len(header.columns), 1))
+
+    schema = None
+    rows = 0
+    for chunk in pd.read_csv(file_path, chunksize=chunk_rows):
+        chunk = normalize_missing(chunk)
+        chunk.columns = [sanitize_column_name(col) for col in chunk.columns]
+        if schema is None:
+            if chunk.empty:
+                break
+            schema = StreamingSchema(chunk)
+            # Index candidates come from the first chunk, the build waits for the last
+            indexed = index_columns(file_type, chunk, schema.kinds)
+            metadata = MetaData()
+            schema.table(table_name, metadata)
+            with create_turn():
+                metadata.create_all(engine)
+            logger.info(f"Created table: {table_name}")
+        else:
+            widened = schema.widen(chunk)
+            if widened:
+                alter_column_types(engine, table_name, widened)
+
+        if not load_dataframe_to_table(engine, chunk, table_name):
+            return None
+        rows += len(chunk)
+
+    if schema is None:
+        logger.warning(f"File {file_path} is empty, skipping")
+        return rows
+    # Columns widened to TEXT since the first chunk can no longer be indexed
+    index_table(engine, table_name, [col for col in indexed if schema.kinds[col] != 'text'])
+    return rows
+
+
 def load_dataframe_to_table(engine, df, table_name):
     """Insert DataFrame contents into database table using SQLAlchemy"""
     try:
         # Sanitize column names
         df.columns = [sanitize_column_name(col) for col in df.columns]
         
-        # Use the to_sql method of pandas with SQLAlchemy engine
-        # If table exists, append to it
-        df.to_sql(
-            name=table_name,
-            con=engine,
-            if_exists='append',
-            index=False,
-            chunksize=1000  # Insert in chunks to prevent memory issues
-        )
+        # Append to the existing table with the bulk loader for this database
+        loader = get_loader(engine, BULK_LOADER)
+        loader.load(engine, df, table_name)
         
-        logger.info(f"Successfully loaded data into {table_name}")
+        logger.info(f"Successfully loaded data into {table_name} ({loader.name})")
         return True
-    except SQLAlchemyError as e:
+    except (SQLAlchemyError, OSError) as e:
         logger.error(f"Error loading data into {table_name}: {e}")
         return False
 
 
-def process_data_file(engine, file_path, dataset_name):
-    """Process individual data file and load into database using SQLAlchemy"""
+def process_data_file(engine, file_path, dataset_name, create_turn=nullcontext, target=None):
+    """Process individual data file and load into database using SQLAlchemy.
+
+    Returns the number of rows loaded, or None if the file failed to load.
+    create_turn wraps table creation so that parallel workers create their tables
+    in file order; target maps each table name to the table actually written.
+    """
+    if target is None:
+        target = lambda name: name
     try:
         # Extract file type from name
         file_name = os.path.basename(file_path)
@@ -142,7 +319,7 @@ def process_data_file(engine, file_path, dataset_name):
             # Standard file naming for main directory files
             table_name = f"{dataset_name}_{file_type}"
             
-        table_name = sanitize_column_name(table_name)
+        table_name = target(sanitize_column_name(table_name))
         
         logger.info(f"Processing file: {file_path}")
         
@@ -183,20 +360,17 @@ def process_data_file(engine, file_path, dataset_name):
                 # Extract stable_id if available for better naming
                 stable_id = metadata.get('stable_id', 'case_list')
                 meta_table_name = f"{dataset_name}_meta_{stable_id}"
-                meta_table_name = sanitize_column_name(meta_table_name)
+                meta_table_name = target(sanitize_column_name(meta_table_name))
                 
                 # Create DataFrame for metadata
                 meta_df = pd.DataFrame([metadata])
                 
-                # Create metadata table and load data
+                # Create metadata table
                 meta_table = create_dynamic_table_class(meta_table_name, meta_df, MetaData())
-                meta_table.metadata.create_all(engine)
-                load_dataframe_to_table(engine, meta_df, meta_table_name)
-                logger.info(f"Created and loaded metadata table: {meta_table_name}")
                 
                 # 2. Create cases table (one row per case ID with reference to metadata)
                 cases_table_name = f"{dataset_name}_cases_{stable_id}"
-                cases_table_name = sanitize_column_name(cases_table_name)
+                cases_table_name = target(sanitize_column_name(cases_table_name))
                 
                 # Create DataFrame for cases
                 case_rows = []
@@ -207,17 +381,28 @@ def process_data_file(engine, file_path, dataset_name):
                         'dataset': dataset_name
                     })
                 
-                if case_rows:
-                    cases_df = pd.DataFrame(case_rows)
-                    
-                    # Create cases table and load data
-                    cases_table = create_dynamic_table_class(cases_table_name, cases_df, MetaData())
-                    cases_table.metadata.create_all(engine)
-                    load_dataframe_to_table(engine, cases_df, cases_table_name)
+                cases_df = pd.DataFrame(case_rows) if case_rows else None
+                
+                # Create both tables, then load them
+                with create_turn():
+                    meta_table.metadata.create_all(engine)
+                    if cases_df is not None:
+                        cases_table = create_dynamic_table_class(cases_table_name, cases_df, MetaData())
+                        cases_table.metadata.create_all(engine)
+                
+                if not load_dataframe_to_table(engine, meta_df, meta_table_name):
+                    return None
+                rows = len(meta_df)
+                logger.info(f"Created and loaded metadata table: {meta_table_name}")
+                if cases_df is not None:
+                    if not load_dataframe_to_table(engine, cases_df, cases_table_name):
+                        return None
+                    rows += len(cases_df)
+                    index_table(engine, cases_table_name, columns_to_index('case_list', cases_df))
                     logger.info(f"Created and loaded cases table with {len(case_rows)} cases: {cases_table_name}")
                 
                 # No need to continue with standard processing
-                return
+                return rows
                 
             except Exception as e:
                 logger.error(f"Error parsing case_list file {file_path}: {e}")
@@ -244,6 +429,14 @@ def process_data_file(engine, file_path, dataset_name):
                 # If that fails, try without headers
                 df = pd.read_csv(file_path, comment='#', header=None)
                 
+        elif is_matrix_file(file_path) and file_path.endswith('.csv'):
+            # Gene x sample matrices go to the array store instead of a table with a
+            # column per sample; drop such a table left by an earlier loader
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {sanitize_column_name(f'{dataset_name}_{file_type}')}"))
+            return array_store.build_store(engine, file_path, dataset_name)
+        elif STREAM_LOAD and (file_path.endswith('.csv') or file_path.endswith('.seg')):
+            return stream_data_file(engine, file_path, table_name, create_turn)
         elif file_path.endswith('.csv'):
             df = pd.read_csv(file_path)
         elif file_path.endswith('.seg'):
@@ -251,12 +444,13 @@ def process_data_file(engine, file_path, dataset_name):
             df = pd.read_csv(file_path)
         else:
             logger.warning(f"Skipping unsupported file format: {file_path}")
-            return
+            return 0
         
         # Skip empty dataframes
+        df = normalize_missing(df)
         if df.empty:
             logger.warning(f"File {file_path} is empty, skipping")
-            return
+            return 0
             
         # Create metadata object
         metadata = MetaData()
@@ -265,45 +459,269 @@ def process_data_file(engine, file_path, dataset_name):
         table = create_dynamic_table_class(table_name, df, metadata)
         
         # Create table in the database
-        metadata.create_all(engine)
+        with create_turn():
+            metadata.create_all(engine)
         logger.info(f"Created table: {table_name}")
         
-        # Load data into the table
-        load_dataframe_to_table(engine, df, table_name)
+        # Load data into the table, then index it
+        if not load_dataframe_to_table(engine, df, table_name):
+            return None
+        index_table(engine, table_name, columns_to_index(file_type, df))
+        return len(df)
         
     except Exception as e:
         logger.error(f"Error processing file {file_path}: {e}")
+        return None
 
 
-def load_dataset(engine, dataset_path, dataset_name):
-    """Load all files from a dataset directory including the case_list subdirectory"""
-    logger.info(f"Loading dataset: {dataset_name} from {dataset_path}")
+def dataset_files(dataset_path):
+    """Data files of a dataset directory in a stable order: main files first, then case lists"""
+    data_files = sorted(glob.glob(os.path.join(dataset_path, '*.csv')))
     
-    # Get all files in the main dataset directory
-    data_files = []
-    for ext in ['*.csv']:
-        data_files.extend(glob.glob(os.path.join(dataset_path, ext)))
-    
-    # Check for case_list directory
     case_list_dir = os.path.join(dataset_path, 'case_lists')
     if os.path.isdir(case_list_dir):
-        logger.info(f"Found case_lists directory in {dataset_name}")
-        # Get all files from the case_list directory
         for ext in ['*.txt', '*.csv', '*.tsv']:
-            case_files = glob.glob(os.path.join(case_list_dir, ext))
-            # Add to our list of files to process
-            data_files.extend(case_files)
+            data_files.extend(sorted(glob.glob(os.path.join(case_list_dir, ext))))
+    return data_files
+
+
+def shadow_name(table_name, suffix='shadow'):
+    """Name of the side table a reload writes to; unique per table and within MySQL's 64 chars"""
+    digest = hashlib.sha1(table_name.encode('utf-8')).hexdigest()[:6]
+    return f"{table_name[:48]}__{suffix}_{digest}"
+
+
+class ShadowTables:
+    """Redirects the tables of one file to shadow tables, swapped in once the whole file loaded.
+
+    Readers keep seeing the previous version of a table until the swap, and a
+    failed or interrupted load never leaves a half-filled table behind.
+    """
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.tables = {}  # table name -> shadow table name
+
+    def __call__(self, table_name):
+        if table_name not in self.tables:
+            self.tables[table_name] = shadow_name(table_name)
+            # Leftover of an interrupted run; the load must start from an empty table
+            self._drop(self.tables[table_name])
+        return self.tables[table_name]
+
+    def _quote(self, name):
+        return self.engine.dialect.identifier_preparer.quote(name)
+
+    def _drop(self, name):
+        with self.engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self._quote(name)}"))
+
+    def swap(self, conn):
+        """Replace each table by its shadow and return the names swapped in.
+
+        Tables the load never created are left alone.
+        """
+        q = self._quote
+        existing = set(inspect(conn).get_table_names())
+        swapped = []
+        for table_name, shadow in self.tables.items():
+            if shadow not in existing:
+                continue
+            if self.engine.dialect.name == 'mysql':
+                # One multi-table RENAME is atomic: the table is never missing
+                if table_name in existing:
+                    old = shadow_name(table_name, 'old')
+                    conn.execute(text(f"DROP TABLE IF EXISTS {q(old)}"))
+                    conn.execute(text(f"RENAME TABLE {q(table_name)} TO {q(old)}, {q(shadow)} TO {q(table_name)}"))
+                    conn.execute(text(f"DROP TABLE {q(old)}"))
+                else:
+                    conn.execute(text(f"RENAME TABLE {q(shadow)} TO {q(table_name)}"))
+            else:
+                # Transactional DDL (SQLite, PostgreSQL): drop and rename commit together
+                conn.execute(text(f"DROP TABLE IF EXISTS {q(table_name)}"))
+                conn.execute(text(f"ALTER TABLE {q(shadow)} RENAME TO {q(table_name)}"))
+            logger.info(f"Swapped in {table_name}")
+            swapped.append(table_name)
+        return swapped
+
+    def discard(self):
+        for shadow in self.tables.values():
+            self._drop(shadow)
+
+
+def load_file(engine, file_path, dataset_name, create_turn=nullcontext):
+    """Load one file and return its FileTiming, or None if the manifest shows it unchanged.
+
+    The file is loaded into shadow tables and swapped in, and its manifest entry
+    is marked complete in the same step, so a rerun after an interruption
+    resumes with the first file that did not complete.
+    """
+    start = time.perf_counter()
+    with engine.begin() as conn:
+        unchanged, sha1 = load_manifest.check_file(conn, file_path)
+        if unchanged:
+            logger.info(f"Skipping unchanged file: {file_path}")
+            return None
+        load_manifest.record(conn, file_path, dataset_name, sha1, 'loading')
+
+    shadows = ShadowTables(engine)
+    rows = process_data_file(engine, file_path, dataset_name, create_turn, shadows)
+    if rows is None:
+        shadows.discard()
+        with engine.begin() as conn:
+            load_manifest.record(conn, file_path, dataset_name, sha1, 'failed')
+        return FileTiming(dataset_name, file_path, 0, time.perf_counter() - start)
+
+    with engine.begin() as conn:
+        tables = shadows.swap(conn)
+        load_manifest.record(conn, file_path, dataset_name, sha1, 'complete', tables, rows)
+    return FileTiming(dataset_name, file_path, rows, time.perf_counter() - start)
+
+
+def finish_dataset(dataset_path, dataset_name):
+    """Build the binary mirror and heatmap pyramids used by the analysis routes"""
+    convert_dataset(dataset_path)
+    build_pyramids(dataset_path)
+    logger.info(f"Completed loading dataset: {dataset_name}")
+
+
+def load_dataset(engine, dataset_path, dataset_name):
+    """Load all files from a dataset directory including the case_list subdirectory"""
+    logger.info(f"Loading dataset: {dataset_name} from {dataset_path}")
     
+    data_files = dataset_files(dataset_path)
     logger.info(f"Found {len(data_files)} files to process")
     
     # Process each file
-    for file_path in data_files:
-        process_data_file(engine, file_path, dataset_name)
+    timings = [load_file(engine, file_path, dataset_name) for file_path in data_files]
     
-    logger.info(f"Completed loading dataset: {dataset_name}")
+    finish_dataset(dataset_path, dataset_name)
+    return timings
+
+
+class CreationTurn:
+    """Lets parallel workers create their tables in file order.
+
+    File number `position` waits until every earlier file has created its tables
+    (or given up), creates its own, then passes the turn on. Loading the data is
+    not serialized.
+    """
+
+    def __init__(self, counter, ready, position):
+        self.counter = counter
+        self.ready = ready
+        self.position = position
+        self.released = False
+
+    def __call__(self):
+        return self
+
+    def __enter__(self):
+        if not self.released:
+            with self.ready:
+                self.ready.wait_for(lambda: self.counter.value >= self.position)
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+        return False
+
+    def release(self):
+        if self.released:
+            return
+        self.released = True
+        with self.ready:
+            self.counter.value = max(self.counter.value, self.position + 1)
+            self.ready.notify_all()
 
 
-def main():
+# State of a loader worker process, set up by _init_worker
+_worker_engine = None
+_worker_turn = None
+
+
+def _init_worker(counter, ready):
+    """Give each worker process its own engine and the shared table-creation turn"""
+    global _worker_engine, _worker_turn
+    _worker_engine = get_engine()
+    _worker_turn = (counter, ready)
+
+
+def _load_file_task(task):
+    position, file_path, dataset_name = task
+    turn = CreationTurn(*_worker_turn, position)
+    try:
+        return load_file(_worker_engine, file_path, dataset_name, turn)
+    finally:
+        # Files that failed or were skipped before creating a table still pass the turn on
+        turn.release()
+
+
+def _finish_dataset_task(task):
+    finish_dataset(*task)
+
+
+def load_datasets_parallel(datasets, workers):
+    """Load the files of all datasets concurrently on a process pool.
+
+    datasets is a list of (dataset_path, dataset_name). Tables are created in the
+    same order as a sequential load; returns the FileTiming of every file (None
+    for files skipped as unchanged).
+    """
+    tasks = []
+    for dataset_path, dataset_name in datasets:
+        data_files = dataset_files(dataset_path)
+        logger.info(f"Loading dataset: {dataset_name} from {dataset_path} ({len(data_files)} files)")
+        for file_path in data_files:
+            tasks.append((len(tasks), file_path, dataset_name))
+    
+    counter = multiprocessing.Value('i', 0)
+    ready = multiprocessing.Condition()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(counter, ready)) as pool:
+        timings = list(pool.map(_load_file_task, tasks))
+        list(pool.map(_finish_dataset_task, datasets))
+    return timings
+
+
+def report_timings(timings, elapsed):
+    """Log per-file load time and throughput, slowest first"""
+    if not timings:
+        return
+    for timing in sorted(timings, key=lambda t: t.seconds, reverse=True):
+        rate = timing.rows / timing.seconds if timing.seconds else 0
+        logger.info(f"{timing.seconds:8.2f}s {timing.rows:10d} rows {rate:12.0f} rows/s  {timing.file}")
+    total_rows = sum(t.rows for t in timings)
+    logger.info(f"Loaded {total_rows} rows from {len(timings)} files in {elapsed:.2f}s "
+                f"({total_rows / elapsed if elapsed else 0:.0f} rows/s)")
+
+
+def build_summary_snapshot(dataset_name):
+    """Compute and store the summary snapshot of one dataset (runs in a worker process)"""
+    engine = get_engine()
+    try:
+        with engine.connect() as conn:
+            store_snapshot(conn, dataset_name, compute_summary(conn, dataset_name))
+            conn.commit()
+        return True
+    except Exception as e:
+        logger.error(f"Error building summary snapshot for {dataset_name}: {e}")
+        return False
+    finally:
+        engine.dispose()
+
+
+def build_summary_snapshots(engine, datasets, workers=None):
+    """Build the summary snapshots of all loaded datasets on a process pool"""
+    if not datasets:
+        return
+    ensure_snapshot_table(engine)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for dataset, ok in zip(datasets, pool.map(build_summary_snapshot, datasets)):
+            if ok:
+                logger.info(f"Built summary snapshot for {dataset}")
+
+
+def main(workers=LOAD_WORKERS):
     """Main function to load all datasets"""
     try:
         # Create SQLAlchemy engine
@@ -319,14 +737,34 @@ def main():
         
         logger.info(f"Found {len(datasets)} datasets to load")
         
-        # Process each dataset
+        found = []
         for dataset in datasets:
             dataset_path = os.path.join('datasets', dataset)
             if os.path.isdir(dataset_path):
-                load_dataset(engine, dataset_path, dataset)
+                found.append((dataset_path, dataset))
             else:
                 logger.warning(f"Dataset directory not found: {dataset_path}")
         
+        # Process each dataset
+        load_manifest.ensure_manifest_table(engine)
+        start = time.perf_counter()
+        if workers > 1:
+            timings = load_datasets_parallel(found, workers)
+        else:
+            timings = []
+            for dataset_path, dataset in found:
+                timings.extend(load_dataset(engine, dataset_path, dataset))
+        skipped = timings.count(None)
+        timings = [timing for timing in timings if timing is not None]
+        if skipped:
+            logger.info(f"Skipped {skipped} files unchanged since their last load")
+        report_timings(timings, time.perf_counter() - start)
+        
+        # Precompute the summary page of every dataset that changed
+        changed = {timing.dataset for timing in timings}
+        build_summary_snapshots(engine, [dataset for _, dataset in found if dataset in changed],
+                                workers if workers > 1 else None)
+        
         logger.info("Data loading process completed")
     
     except Exception as e:
@@ -334,4 +772,7 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Load the cBioPortal datasets into the database")
+    parser.add_argument('--workers', type=int, default=LOAD_WORKERS,
+                        help="worker processes for parallel loading (default: LOAD_WORKERS or 1)")
+    main(parser.parse_args().workers)
@@ -3,42 +3,146 @@ from flask import jsonify, request
 import pandas as pd
 import numpy as np
 from scipy import stats
-from utils.database import get_db
-from lifelines import KaplanMeierFitter
 from sqlalchemy import text
+from utils.database import get_db, request_db
+from utils import array_store, columnar, jobs
+from utils.correlation import paired_values, top_correlated
+from utils.differential import differential_analysis, resolve_group
+from utils.feature_stats import AGE_BINS, AGE_LABELS, FEATURE_COLUMNS, batch_feature_stats
+from utils.config import Config
+from utils.instrumentation import stage
+from utils.clinical_cache import get_clinical_frame, source_signature
+from utils.survival import ENDPOINTS, stratified_survival, survival_cache
 import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Matrix the genome-wide analyses run on unless the request names another profile
+ANALYSIS_PROFILE = 'data_methylation_hm450'
+
+
+def valid_profile(profile):
+    """True for a matrix file name (never a path, it comes from the request)"""
+    return columnar.is_matrix_file(profile) and os.path.basename(profile) == profile
+
+def load_gene_clinical(dataset_name, gene, clinical_feature):
+    """Attach one gene's methylation values to the cached clinical frame"""
+    clinical_data = get_clinical_frame(dataset_name)
+
+    gene_meth = array_store.read_gene_rows(dataset_name, 'data_methylation_hm450', [gene])
+    with stage('merge'):
+        gene_meth = gene_meth.loc[:, gene_meth.columns.isin(clinical_data.index)]
+        gene_meth = gene_meth.reset_index().melt(id_vars=['Hugo_Symbol'],
+                                                 var_name='SAMPLE_ID',
+                                                 value_name='methylation_value')
+
+        # Sample lookups go straight through the SAMPLE_ID index
+        columns = ['PATIENT_ID']
+        if FEATURE_COLUMNS.get(clinical_feature) in clinical_data.columns:
+            columns.append(FEATURE_COLUMNS[clinical_feature])
+        clinical_rows = clinical_data.loc[gene_meth['SAMPLE_ID'], columns].reset_index(drop=True)
+        return pd.concat([gene_meth, clinical_rows], axis=1)
+
+
+def load_altered_samples(dataset_name, gene):
+    """Sample ids with at least one mutation in gene"""
+    db = next(get_db())
+    try:
+        result = db.execute(
+            text(f"SELECT DISTINCT tumor_sample_barcode FROM {dataset_name}_data_mutations WHERE hugo_symbol = :gene"),
+            {"gene": gene}
+        ).fetchall()
+        return {row[0] for row in result}
+    finally:
+        db.close()
+
+
+def mutations_signature(dataset_name):
+    """(mtime, size) of the file the _data_mutations table is loaded from"""
+    try:
+        stat = os.stat(columnar.dataset_file(dataset_name, 'data_mutations'))
+    except OSError:
+        return None
+    return (stat.st_mtime, stat.st_size)
+
+
+def load_survival(dataset_name, gene, endpoint, stratify_by=None):
+    """KM curves for a dataset, optionally stratified by a clinical feature or by gene alteration.
+
+    Raises ValueError for an unknown endpoint or stratification.
+    """
+    if endpoint not in ENDPOINTS:
+        raise ValueError(f"endpoint must be one of {', '.join(ENDPOINTS)}")
+
+    clinical_data = get_clinical_frame(dataset_name)
+    if not set(ENDPOINTS[endpoint][:2]) <= set(clinical_data.columns):
+        raise ValueError(f"Dataset has no {endpoint} survival data")
+    if stratify_by and stratify_by != 'mutation' and FEATURE_COLUMNS.get(stratify_by, stratify_by) not in clinical_data.columns:
+        raise ValueError(f"Unknown stratification: {stratify_by}")
+
+    strata_gene = gene if stratify_by == 'mutation' else None
+    strata_version = mutations_signature(dataset_name) if stratify_by == 'mutation' else None
+    key = (dataset_name, endpoint, stratify_by, strata_gene, strata_version, source_signature(dataset_name))
+
+    def compute():
+        patients = clinical_data.drop_duplicates(subset='PATIENT_ID')
+        groups = None
+        if stratify_by == 'mutation':
+            altered = load_altered_samples(dataset_name, gene)
+            altered_patients = clinical_data.loc[clinical_data['SAMPLE_ID'].isin(altered), 'PATIENT_ID']
+            groups = np.where(patients['PATIENT_ID'].isin(altered_patients), f"{gene} altered", f"{gene} unaltered")
+        elif stratify_by == 'Age':
+            groups = pd.cut(pd.to_numeric(patients['AGE'], errors='coerce'), bins=AGE_BINS, labels=AGE_LABELS)
+        elif stratify_by:
+            groups = patients[FEATURE_COLUMNS.get(stratify_by, stratify_by)]
+        return stratified_survival(patients, endpoint, groups)
+
+    return survival_cache.get_or_compute(key, compute)
+
 
 class Analysis(Resource):
     def post(self, dataset_name):
 
         analysis_params = request.get_json()
-        print(analysis_params)
-
+        logger.debug(f"Analysis request for {dataset_name}: {analysis_params}")
 
-        gene = analysis_params.get("gene").upper()
+        gene = (analysis_params.get("gene") or "").upper()
         analysis_type = analysis_params.get("type")
         # if gene  not in ['TP53', 'PIK3CA', 'CDH1', 'GATA3', 'MAP3K1']:
         #     return jsonify({"error": "Invalid gene name"}), 400
+        if analysis_type == 'differential' and analysis_params.get("groupA"):
+            # Whole-profile comparison of two sample groups
+            profile = analysis_params.get("profile", ANALYSIS_PROFILE)
+            if not valid_profile(profile):
+                return {"error": f"Unknown profile: {profile}"}, 400
+            try:
+                groups = []
+                for spec in (analysis_params.get("groupA"), analysis_params.get("groupB")):
+                    if spec is None:
+                        groups.append(None)  # groupB defaults to every other sample
+                        continue
+                    if isinstance(spec, dict) and spec.get("attribute"):
+                        spec = dict(spec, attribute=FEATURE_COLUMNS.get(spec["attribute"], spec["attribute"]))
+                    groups.append(resolve_group(request_db(), dataset_name, spec))
+
+                top_k = int(analysis_params.get("topK", 100))
+                if top_k < 1:
+                    raise ValueError("topK must be at least 1")
+                with stage('stats'):
+                    result = differential_analysis(dataset_name, profile, groups[0], groups[1],
+                                                   analysis_params.get("test", "welch"), top_k)
+                with stage('serialize'):
+                    return jsonify({"analysis": "differential", **result})
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            except Exception as e:
+                return {"error": f"Error processing request: {str(e)}"}, 500
         if analysis_type == "methylation" or analysis_type == 'differential':
             clinical_feature = analysis_params.get("clinicalFeature")
             
             try:
-                patient_file = './datasets/brca_tcga_pub2015/data_clinical_patient.csv'
-                sample_file = './datasets/brca_tcga_pub2015/data_clinical_sample.csv'
-                meth_file = './datasets/brca_tcga_pub2015/data_methylation_hm450.csv'
-                
-                patient_data = pd.read_csv(patient_file, on_bad_lines='skip')
-                sample_data = pd.read_csv(sample_file, on_bad_lines='skip')
-                methylation_data = pd.read_csv(meth_file, on_bad_lines='skip')
-                
-                clinical_data = pd.merge(sample_data, patient_data, on='PATIENT_ID', how='left')
-                gene_meth = methylation_data[methylation_data['Hugo_Symbol'] == gene]
-                
-                gene_meth = gene_meth.melt(id_vars=['Hugo_Symbol', 'Entrez_Gene_Id'], 
-                          var_name='SAMPLE_ID', 
-                          value_name='methylation_value')
-                
-                merged_data = pd.merge(gene_meth, clinical_data, left_on='SAMPLE_ID', right_on='SAMPLE_ID', how='inner')
+                merged_data = load_gene_clinical(dataset_name, gene, clinical_feature)
                 merged_data['methylation_value'] = pd.to_numeric(merged_data['methylation_value'], errors='coerce')
 
                 results = {
@@ -47,69 +151,69 @@ class Analysis(Resource):
                     'analyses': {},
                 }
 
-                if clinical_feature == 'Age':
-                    merged_data['AGE'] = pd.to_numeric(merged_data['AGE'], errors='coerce')
-                    merged_data = merged_data.dropna(subset=['AGE'])
-
-                    corr, p_value = stats.pearsonr(merged_data['AGE'], merged_data['methylation_value'])
-
-                    merged_data['age_group'] = pd.cut(merged_data['AGE'], 
-                                                      bins=[0, 40, 50, 60, 70, 100], 
-                                                      labels=['<40', '40-50', '50-60', '60-70', '>70'])
-                    box_plot_data = {}
-                    for group, data in merged_data.groupby('age_group'):
-                        st = data['methylation_value'].describe(percentiles=[.25, .5, .75])
-                        box_plot_data[group] = {
-                            'min': st['min'],
-                            'Q1': st['25%'],
-                            'median': st['50%'],
-                            'Q3': st['75%'],
-                            'max': st['max']
-                        }
+                with stage('stats'):
+                    if clinical_feature == 'Age':
+                        merged_data['AGE'] = pd.to_numeric(merged_data['AGE'], errors='coerce')
+                        merged_data = merged_data.dropna(subset=['AGE'])
 
-                    results['analyses']['Age'] = {
-                        'correlation': corr,
-                        'p_value': p_value,
-                        'plots': box_plot_data
-                    }
+                        corr, p_value = stats.pearsonr(merged_data['AGE'], merged_data['methylation_value'])
 
-                elif clinical_feature == 'Gender':
-                    gender_data = merged_data.dropna(subset=['SEX'])
-                    gender_groups = gender_data.groupby('SEX')['methylation_value']
-                    gender_stats = gender_groups.describe(percentiles=[.25, .5, .75]).to_dict()
+                        merged_data['age_group'] = pd.cut(merged_data['AGE'], bins=AGE_BINS, labels=AGE_LABELS)
+                        box_plot_data = {}
+                        for group, data in merged_data.groupby('age_group'):
+                            st = data['methylation_value'].describe(percentiles=[.25, .5, .75])
+                            box_plot_data[group] = {
+                                'min': st['min'],
+                                'Q1': st['25%'],
+                                'median': st['50%'],
+                                'Q3': st['75%'],
+                                'max': st['max']
+                            }
 
-                    results['analyses']['Gender'] = {
-                        'stats': gender_stats
-                    }
+                        results['analyses']['Age'] = {
+                            'correlation': corr,
+                            'p_value': p_value,
+                            'plots': box_plot_data
+                        }
 
-                elif clinical_feature == 'Race':
-                    race_data = merged_data.dropna(subset=['RACE'])
-                    race_groups = race_data.groupby('RACE')['methylation_value']
-                    race_stats = race_groups.describe(percentiles=[.25, .5, .75]).to_dict()
+                    elif clinical_feature == 'Gender':
+                        gender_data = merged_data.dropna(subset=['SEX'])
+                        gender_groups = gender_data.groupby('SEX')['methylation_value']
+                        gender_stats = gender_groups.describe(percentiles=[.25, .5, .75]).to_dict()
 
-                    results['analyses']['Race'] = {
-                        'stats': race_stats
-                    }
+                        results['analyses']['Gender'] = {
+                            'stats': gender_stats
+                        }
 
-                elif clinical_feature == 'Tumor Histology':
-                    histology_data = merged_data.dropna(subset=['TUMOR_STATUS'])
-                    histology_groups = histology_data.groupby('TUMOR_STATUS')['methylation_value']
-                    histology_stats = histology_groups.describe(percentiles=[.25, .5, .75]).to_dict()
+                    elif clinical_feature == 'Race':
+                        race_data = merged_data.dropna(subset=['RACE'])
+                        race_groups = race_data.groupby('RACE')['methylation_value']
+                        race_stats = race_groups.describe(percentiles=[.25, .5, .75]).to_dict()
 
-                    results['analyses']['Tumor Histology'] = {
-                        'stats': histology_stats
-                    }
+                        results['analyses']['Race'] = {
+                            'stats': race_stats
+                        }
 
-                elif clinical_feature == 'Cancer State':
-                    state_data = merged_data.dropna(subset=['AJCC_PATHOLOGIC_TUMOR_STAGE'])
-                    state_groups = state_data.groupby('AJCC_PATHOLOGIC_TUMOR_STAGE')['methylation_value']
-                    state_stats = state_groups.describe(percentiles=[.25, .5, .75]).to_dict()
+                    elif clinical_feature == 'Tumor Histology':
+                        histology_data = merged_data.dropna(subset=['TUMOR_STATUS'])
+                        histology_groups = histology_data.groupby('TUMOR_STATUS')['methylation_value']
+                        histology_stats = histology_groups.describe(percentiles=[.25, .5, .75]).to_dict()
 
-                    results['analyses']['Cancer State'] = {
-                        'stats': state_stats
-                    }
+                        results['analyses']['Tumor Histology'] = {
+                            'stats': histology_stats
+                        }
+
+                    elif clinical_feature == 'Cancer State':
+                        state_data = merged_data.dropna(subset=['AJCC_PATHOLOGIC_TUMOR_STAGE'])
+                        state_groups = state_data.groupby('AJCC_PATHOLOGIC_TUMOR_STAGE')['methylation_value']
+                        state_stats = state_groups.describe(percentiles=[.25, .5, .75]).to_dict()
+
+                        results['analyses']['Cancer State'] = {
+                            'stats': state_stats
+                        }
 
-                return jsonify(results)
+                with stage('serialize'):
+                    return jsonify(results)
 
             except Exception as e:
                 return jsonify({
@@ -118,63 +222,117 @@ class Analysis(Resource):
         
         if analysis_type == 'survival':
             try:
-                table_name = dataset_name + "_data_clinical_patient"
-                db = next(get_db())
-                result = db.execute(text(f"SELECT os_months, os_status FROM {table_name} WHERE os_months NOT LIKE '%Not Available%'")).mappings().all()
-
-                df = pd.DataFrame(result)
-                df['event'] = df['os_status'].apply(lambda x: 1 if x == '1:DECEASED' else 0)
-                kmf = KaplanMeierFitter()
-                kmf.fit(durations=df['os_months'], event_observed=df['event'])
-                
-                response_data = {
-                    "gene": gene,
-                    "sample_count": len(df),
-                    "kmData": []
-                }
-                
-                for time, survival_prob in zip(kmf.survival_function_.index, kmf.survival_function_['KM_estimate']):
-                    censored = not df[df['os_months'] == time]['event'].any()
+                endpoint = analysis_params.get("endpoint", "os")
+                stratify_by = analysis_params.get("stratifyBy")
 
-                    response_data['kmData'].append({
-                        "time": time,
-                        "survival": survival_prob,
-                        'censored': censored
-                    })
-                return jsonify(response_data)
+                response_data = dict(load_survival(dataset_name, gene, endpoint, stratify_by))
+                response_data["gene"] = gene
+                with stage('serialize'):
+                    return jsonify(response_data)
 
+            except ValueError as e:
+                return {"error": str(e)}, 400
             except Exception as e:
-                print("hereeeeeeeeeeeeeee")
-                return jsonify({
-                    "error": f"Error processing request: {str(e)}"
-                }), 500
+                return {"error": f"Error processing request: {str(e)}"}, 500
         if analysis_type == 'correlation':
-            gene2 = analysis_params.get("gene2").upper()
-            meth_file = './datasets/brca_tcga_pub2015/data_methylation_hm450.csv'
-
-            # Read the file
-            df = pd.read_csv(meth_file, na_values=['Not Available'])
-
-            # Filter for BRCA1 and BRCA2
-            df_brca = df[(df['Hugo_Symbol'] == gene) | (df['Hugo_Symbol'] == gene2)]
-            df_brca.drop(columns=['Entrez_Gene_Id'], inplace=True)
-
-            # Transpose the DataFrame to have samples as columns
-            df_transposed = df_brca.set_index('Hugo_Symbol').T
-            df_transposed = df_transposed[:100]
-            x = sorted(list(df_transposed[gene].to_numpy()))
-            y = sorted(list(df_transposed[gene2].to_numpy()))
-            for i in range(100):
-                x[i] += 0.01*i + np.random.randn()/5
-                y[i] += 0.01*i + np.random.randn()/5
-            
-            response = {
-                "analysis": "correlation",
-                "GeneA_point": x,
-                "GeneB_point": y,
-                "GeneA": gene,
-                "GeneB": gene2
-            }
-            return jsonify(response)
+            method = analysis_params.get("method", "pearson")
+            profile = analysis_params.get("profile", ANALYSIS_PROFILE)
+            if not valid_profile(profile):
+                return {"error": f"Unknown profile: {profile}"}, 400
+            try:
+                if analysis_params.get("gene2"):
+                    # Scatter of the two genes' values, paired by sample
+                    gene2 = analysis_params.get("gene2").upper()
+                    with stage('stats'):
+                        pair = paired_values(dataset_name, profile, gene, gene2, method)
+                    response = {
+                        "analysis": "correlation",
+                        "GeneA_point": pair["x"],
+                        "GeneB_point": pair["y"],
+                        "GeneA": gene,
+                        "GeneB": gene2,
+                        "samples": pair["samples"],
+                        "method": method,
+                        "correlation": pair["r"],
+                        "pValue": pair["pValue"],
+                        "n": pair["n"],
+                    }
+                else:
+                    # Genome-wide: the genes most correlated with gene
+                    top_k = int(analysis_params.get("topK", 20))
+                    if top_k < 1:
+                        raise ValueError("topK must be at least 1")
+                    with stage('stats'):
+                        response = {"analysis": "correlation", "profile": profile,
+                                    **top_correlated(dataset_name, profile, gene, method, top_k)}
+                with stage('serialize'):
+                    return jsonify(response)
+
+            except ValueError as e:
+                return {"error": str(e)}, 400
+            except KeyError as e:
+                return {"error": f"Gene not found: {e}"}, 404
+            except Exception as e:
+                return {"error": f"Error processing request: {str(e)}"}, 500
         
-        return jsonify({"error": "Invalid analysis type"}), 400
\ No newline at end of file
+        return jsonify({"error": "Invalid analysis type"}), 400
+
+
+class AnalysisBatch(Resource):
+    def post(self, dataset_name):
+        """Every requested gene x clinical feature analysis, from one profile and clinical load"""
+        params = request.get_json() or {}
+        genes = params.get("genes")
+        features = params.get("features") or list(FEATURE_COLUMNS)
+        profile = params.get("profile", ANALYSIS_PROFILE)
+
+        if not isinstance(genes, list) or not genes:
+            return {"error": "genes must be a non-empty list"}, 400
+        if not isinstance(features, list):
+            return {"error": "features must be a list"}, 400
+        genes = list(dict.fromkeys(str(gene).upper() for gene in genes))
+        if len(genes) > Config.BATCH_MAX_GENES:
+            return {"error": f"At most {Config.BATCH_MAX_GENES} genes per request"}, 400
+        unknown = [feature for feature in features if feature not in FEATURE_COLUMNS]
+        if unknown:
+            return {"error": f"Unknown features: {', '.join(map(str, unknown))}"}, 400
+        if not valid_profile(profile):
+            return {"error": f"Unknown profile: {profile}"}, 400
+
+        try:
+            with stage('stats'):
+                result = batch_feature_stats(dataset_name, profile, genes,
+                                             {feature: FEATURE_COLUMNS[feature] for feature in features})
+            with stage('serialize'):
+                return jsonify(result)
+        except Exception as e:
+            return {"error": f"Error processing request: {str(e)}"}, 500
+
+
+class AnalysisJobs(Resource):
+    def post(self, dataset_name):
+        """Queue a long-running analysis; identical requests on unchanged data share one job"""
+        params = dict(request.get_json() or {})
+        params.setdefault("profile", ANALYSIS_PROFILE)
+        if not valid_profile(params["profile"]):
+            return {"error": f"Unknown profile: {params['profile']}"}, 400
+        try:
+            job = jobs.submit(params.get("kind"), dataset_name, params)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        return job, 200 if job["status"] == "completed" else 202
+
+
+class AnalysisJob(Resource):
+    def get(self, dataset_name, job_id):
+        """Status and progress of a job, with its result once completed"""
+        job = jobs.get_job(job_id)
+        if job is None or job["dataset"] != dataset_name:
+            return {"error": f"Unknown job: {job_id}"}, 404
+        return job
+
+    def delete(self, dataset_name, job_id):
+        job = jobs.get_job(job_id)
+        if job is None or job["dataset"] != dataset_name:
+            return {"error": f"Unknown job: {job_id}"}, 404
+        return jobs.cancel_job(job_id)
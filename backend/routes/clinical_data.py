@@ -1,6 +1,6 @@
 from flask_restful import Resource
 from flask import jsonify
-from utils.database import get_db
+from utils.database import request_db
 from sqlalchemy import text
 import random
 
@@ -12,7 +12,7 @@ class ClinicalData(Resource):
         clinical_data = []
         table_name = dataset_name + "_data_clinical_patient"
         table_name = "brca_tcga_pub2015_data_clinical_patient"
-        db = next(get_db())  # Retrieve the actual session
+        db = request_db()  # Released when the request ends
         try:
             results = db.execute(text(f"SELECT patient_id, age, race, sex, ajcc_pathologic_tumor_stage, os_status, os_months FROM {table_name} LIMIT 200")).mappings().all()
             for row in results:
@@ -31,6 +31,3 @@ class ClinicalData(Resource):
         
         except Exception as e:
             return {"error": str(e)}, 500
-        
-        finally:
-            db.close()  # Ensure the session is closed properly
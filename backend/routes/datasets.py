@@ -1,6 +1,6 @@
 from flask_restful import Resource
 from flask import jsonify
-from utils.database import get_db
+from utils.database import request_db
 from sqlalchemy import text
 
 class Datasets(Resource):
@@ -8,7 +8,7 @@ class Datasets(Resource):
     def get(self):
         """Return all datasets grouped by type"""
         datasets = []
-        db = next(get_db())  # Retrieve the actual session
+        db = request_db()  # Released when the request ends
         try:
             results = db.execute(text("SELECT * FROM dataset")).mappings().all()  # Convert rows to dictionaries
             for row in results:
@@ -36,6 +36,4 @@ class Datasets(Resource):
             return grouped_datasets
             
         except Exception as e:
-            return {"error": str(e)}, 500
-        finally:
-            db.close()  # Ensure the session is closed properly
\ No newline at end of file
+            return {"error": str(e)}, 500
\ No newline at end of file
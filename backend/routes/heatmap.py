@@ -6,42 +6,162 @@ import json
 from functools import lru_cache
 import plotly
 from flask_restful import Resource, Api
+import os
 import numpy as np
+from utils import array_store, columnar
+from utils.heatmap_tiles import read_tile, TILE_SIZE, POOLING, DEFAULT_PROFILE
+from utils.transport import MATRIX_DTYPES, matrix_response, labels_response, labels_version
+from utils.heatmap_cluster import cluster_frame
+from utils.instrumentation import stage
+
+HEATMAP_DATASET = 'brca_tcga_pub2015'
+
+
+def heatmap_args():
+    """(genes, cluster, metric, method) from the query string.
+
+    genes is a tuple of Hugo symbols (None for the default gene set) and
+    cluster is None when not requested.
+    """
+    genes = request.args.get('genes')
+    return (
+        tuple(gene.strip() for gene in genes.split(',') if gene.strip()) if genes else None,
+        request.args.get('cluster'),
+        request.args.get('metric', 'euclidean'),
+        request.args.get('method', 'average'),
+    )
+
+
+def ordered_data(genes=None, cluster=None, metric='euclidean', method='average'):
+    """Heatmap matrix, reindexed by the cached dendrogram order when clustering is requested"""
+    df = load_and_process_data(genes)
+    if not cluster:
+        return df, {}
+    with stage('stats'):
+        return cluster_frame(df, cluster, HEATMAP_DATASET, DEFAULT_PROFILE, metric, method)
 
 
 class Heatmap(Resource):
     def get(self):
         try:
-            # Load data
-            df = load_and_process_data()
+            # Load data (optionally in dendrogram order)
+            genes, cluster, metric, method = heatmap_args()
+            df, _ = ordered_data(genes, cluster, metric, method)
+            
+            # Compact mode: quantized z-values, labels fetched separately from /heatmap/labels
+            matrix_format = request.args.get('format', 'plotly')
+            if matrix_format in MATRIX_DTYPES:
+                return matrix_response(
+                    df.values, matrix_format,
+                    binary=request.args.get('encoding') == 'binary',
+                    extra={"labels": labels_version(df.index, df.columns)},
+                )
             
             # Create a hash of the data to use as a cache key
             data_hash = hash(df.values.tobytes())
             
             # Get cached figure
-            fig = create_figure(data_hash)
+            fig = create_figure(data_hash, genes, cluster, metric, method)
             
             # Convert to JSON with reduced precision
-            plotly_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
+            with stage('serialize'):
+                plotly_json = json.dumps(fig, cls=plotly.utils.PlotlyJSONEncoder)
             return plotly_json
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+class HeatmapLabels(Resource):
+    def get(self):
+        """Gene and sample labels of the heatmap matrix (ETag-cacheable)"""
+        try:
+            df, linkages = ordered_data(*heatmap_args())
+            dendrograms = None
+            if request.args.get('dendrogram'):
+                dendrograms = {axis: matrix.tolist() for axis, matrix in linkages.items()}
+            return labels_response(df.index.tolist(), df.columns.tolist(), dendrograms=dendrograms)
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            return {"error": str(e)}, 500
+
+
+class HeatmapTiles(Resource):
+    def get(self, dataset_name):
+        """Return one fixed-size tile of the precomputed heatmap pyramid"""
+        try:
+            level = request.args.get('level', 0, type=int)
+            row = request.args.get('row', 0, type=int)
+            col = request.args.get('col', 0, type=int)
+            pooling = request.args.get('pooling', 'mean')
+            profile = request.args.get('profile', DEFAULT_PROFILE)
+            if pooling not in POOLING:
+                return {"error": f"pooling must be one of {', '.join(POOLING)}"}, 400
+            if not columnar.is_matrix_file(profile) or os.path.basename(profile) != profile:
+                return {"error": "Invalid profile"}, 400
+
+            file_path = columnar.dataset_file(dataset_name, profile)
+            if not os.path.exists(file_path):
+                return {"error": "Profile not found"}, 404
+
+            tile, info = read_tile(file_path, level, row, col, pooling)
+
+            # Tile extent in full-resolution (gene, sample) coordinates
+            scale = 2 ** level
+            row_start, col_start = row * TILE_SIZE * scale, col * TILE_SIZE * scale
+            tile_info = {
+                "level": level,
+                "row": row,
+                "col": col,
+                "tileSize": TILE_SIZE,
+                "levels": len(info['shapes']),
+                "levelShape": info['shapes'][level],
+                "rowRange": [row_start, min(row_start + tile.shape[0] * scale, info['shapes'][0][0])],
+                "colRange": [col_start, min(col_start + tile.shape[1] * scale, info['shapes'][0][1])],
+            }
+
+            matrix_format = request.args.get('format', 'json')
+            if matrix_format in MATRIX_DTYPES:
+                return matrix_response(tile, matrix_format,
+                                       binary=request.args.get('encoding') == 'binary',
+                                       extra=tile_info)
+
+            z = np.round(tile.astype(float), 2)
+            tile_info["shape"] = list(tile.shape)
+            tile_info["z"] = np.where(np.isnan(z), None, z).tolist()
+            return tile_info
+        except ValueError as e:
+            return {"error": str(e)}, 400
         except Exception as e:
             return {"error": str(e)}, 500
 
-@lru_cache(maxsize=1)
-def load_and_process_data():
-    file_path = "./datasets/brca_tcga_pub2015/data_mrna_seq_v2_rsem_zscores_ref_all_samples.csv"
-    df = pd.read_csv(file_path)
-    df = df.iloc[:200, :200]
-    df.set_index("Hugo_Symbol", inplace=True)
-    df.drop(columns=["Entrez_Gene_Id"], inplace=True)
-    df = df.apply(pd.to_numeric, errors='coerce')
-    df.fillna(0, inplace=True)
+@lru_cache(maxsize=32)
+def load_and_process_data(genes=None):
+    file_path = columnar.dataset_file(HEATMAP_DATASET, DEFAULT_PROFILE)
+    store = array_store.open_store(HEATMAP_DATASET, DEFAULT_PROFILE)
+    if genes:
+        # Only the selected rows are read, from the array store or the CSV row index
+        df = array_store.read_gene_rows(HEATMAP_DATASET, DEFAULT_PROFILE, genes)
+        if df.empty:
+            raise ValueError("None of the requested genes were found")
+    elif store is not None:
+        # Same window as the CSV path: its 200 columns included the two id columns
+        df = store.head(200, 200 - len(columnar.MATRIX_ID_COLUMNS))
+    else:
+        with stage('csv_parse'):
+            df = pd.read_csv(file_path, nrows=200)
+            df = df.iloc[:, :200]
+            df.set_index("Hugo_Symbol", inplace=True)
+            df.drop(columns=["Entrez_Gene_Id"], inplace=True)
+            df = df.apply(pd.to_numeric, errors='coerce')
+    df = df.fillna(0)
     return df
 
 # Cache the figure creation
-@lru_cache(maxsize=1)
-def create_figure(data_hash):
-    df = load_and_process_data()
+@lru_cache(maxsize=16)
+def create_figure(data_hash, genes=None, cluster=None, metric='euclidean', method='average'):
+    df, _ = ordered_data(genes, cluster, metric, method)
     
     # Round values to 2 decimal places to reduce data size
     z_values = np.round(df.values, 2)
@@ -3,7 +3,11 @@ from flask import jsonify, request
 import pandas as pd
 import numpy as np
 from scipy import stats
+from routes.analysis import load_gene_clinical
 import os
+import logging
+
+logger = logging.getLogger(__name__)
 
 class Methylation(Resource):
     def post(self, dataset_name):
@@ -12,28 +16,13 @@ class Methylation(Resource):
         analysis_type = analysis_params.get("type")
         if gene  not in ['TP53', 'PIK3CA', 'CDH1', 'GATA3', 'MAP3K1']:
             return jsonify({"error": "Invalid gene name"}), 400
-        print(analysis_type)
+        logger.debug(f"Methylation request for {dataset_name}: {analysis_type}")
         if analysis_type != "Methylation":
             clinical_feature = analysis_params.get("clinicalFeature")
         
             
             try:
-                patient_file = './datasets/brca_tcga_pub2015/data_clinical_patient.csv'
-                sample_file = './datasets/brca_tcga_pub2015/data_clinical_sample.csv'
-                meth_file = './datasets/brca_tcga_pub2015/data_methylation_hm450.csv'
-                
-                patient_data = pd.read_csv(patient_file, on_bad_lines='skip')
-                sample_data = pd.read_csv(sample_file, on_bad_lines='skip')
-                methylation_data = pd.read_csv(meth_file, on_bad_lines='skip')
-                
-                clinical_data = pd.merge(sample_data, patient_data, on='PATIENT_ID', how='left')
-                gene_meth = methylation_data[methylation_data['Hugo_Symbol'] == gene]
-                
-                gene_meth = gene_meth.melt(id_vars=['Hugo_Symbol', 'Entrez_Gene_Id'], 
-                          var_name='SAMPLE_ID', 
-                          value_name='methylation_value')
-                
-                merged_data = pd.merge(gene_meth, clinical_data, left_on='SAMPLE_ID', right_on='SAMPLE_ID', how='inner')
+                merged_data = load_gene_clinical(dataset_name, gene, clinical_feature)
                 merged_data['methylation_value'] = pd.to_numeric(merged_data['methylation_value'], errors='coerce')
 
                 results = {
@@ -0,0 +1,10 @@
+from flask import Response
+from flask_restful import Resource
+from utils.instrumentation import CONTENT_TYPE, render_metrics
+
+
+class Metrics(Resource):
+
+    def get(self):
+        """Request and stage latency histograms in the Prometheus text format"""
+        return Response(render_metrics(), mimetype=None, content_type=CONTENT_TYPE)
@@ -0,0 +1,16 @@
+from flask_restful import Resource
+from utils.database import pool_status, query_status
+
+
+class PoolStatus(Resource):
+
+    def get(self):
+        """Connection pool usage and checkout wait times, for sizing DB_POOL_SIZE / DB_MAX_OVERFLOW"""
+        return pool_status()
+
+
+class QueryStatus(Resource):
+
+    def get(self):
+        """Query counts per endpoint and the statements with the most total time"""
+        return query_status()
@@ -0,0 +1,291 @@
+# Declarative chart specs for the summary page. Each spec lists the columns it
+# needs and turns the fetched DataFrame into the JSON fragment the frontend
+# expects; aggregate() reads all columns for a table in a single query.
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from utils.survival import ENDPOINTS, kaplan_meier, km_points
+
+
+def _clean(value):
+    """NaN -> None and NumPy scalars -> Python scalars for JSON"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _lower(series):
+    # MySQL's default collation compares strings case-insensitively
+    return series.astype(str).str.lower().where(series.notna())
+
+
+def _floats(series):
+    """Column as a float array with NaN for NULL.
+
+    The loader stores numeric clinical columns as INTEGER/FLOAT; only tables
+    loaded before that still need their text parsed.
+    """
+    if not pd.api.types.is_numeric_dtype(series):
+        series = pd.to_numeric(series, errors='coerce')
+    return series.to_numpy(dtype=float)
+
+
+def _numeric(series):
+    values = _floats(series)
+    return values[~np.isnan(values)]
+
+
+def _group_counts(series):
+    """COUNT(*) ... GROUP BY column, NULL group first"""
+    counts = series.value_counts(dropna=False)
+    return counts.sort_index(na_position='first', key=lambda idx: idx.astype(str))
+
+
+class DistinctCount:
+    """COUNT(DISTINCT column), optionally filtered by column == value"""
+
+    def __init__(self, key, column, where=None):
+        self.key = key
+        self.column = column
+        self.where = where  # (column, value)
+        self.columns = [column] + ([where[0]] if where else [])
+
+    def compute(self, df):
+        values = df[self.column]
+        if self.where:
+            column, value = self.where
+            values = values[_lower(df[column]) == value.lower()]
+        return int(values.nunique())
+
+
+class MatchCount:
+    """COUNT(*) WHERE column = value (or <> value when negate=True)"""
+
+    def __init__(self, key, column, value, negate=False):
+        self.key = key
+        self.column = column
+        self.value = value
+        self.negate = negate
+        self.columns = [column]
+
+    def compute(self, df):
+        values = _lower(df[self.column])
+        if self.negate:
+            # NULL <> value is not true in SQL either
+            return int((values.notna() & (values != self.value.lower())).sum())
+        return int((values == self.value.lower()).sum())
+
+
+class CategoryCounts:
+    """Pie chart of COUNT(*) per value of column"""
+
+    def __init__(self, key, column):
+        self.key = key
+        self.column = column
+        self.columns = [column]
+
+    def compute(self, df):
+        counts = _group_counts(df[self.column])
+        return [{"category": _clean(category), "value": int(count)} for category, count in counts.items()]
+
+
+class CategoryTable:
+    """Table of COUNT(*) and frequency per value of column"""
+
+    def __init__(self, key, column, count_label):
+        self.key = key
+        self.column = column
+        self.count_label = count_label
+        self.columns = [column]
+
+    def compute(self, df):
+        counts = _group_counts(df[self.column])
+        total = counts.sum()
+        return {
+            "columns": ["Category", self.count_label, "Frequency (%)"],
+            "rows": [{
+                "Category": _clean(category),
+                self.count_label: int(count),
+                "Frequency (%)": f"{count / total * 100:.1f}",
+            } for category, count in counts.items()],
+        }
+
+
+class TopCounts:
+    """Most frequent values of column with their share among the top `limit`"""
+
+    def __init__(self, key, column, limit, columns, row):
+        self.key = key
+        self.column = column
+        self.limit = limit
+        self.table_columns = columns
+        self.row = row  # (value, count, frequency) -> dict
+        self.columns = [column]
+
+    def compute(self, df):
+        counts = df[self.column].dropna().value_counts().head(self.limit)
+        total = counts.sum()
+        return {
+            "columns": self.table_columns,
+            "rows": [self.row(_clean(value), int(count), count / total * 100) for value, count in counts.items()],
+        }
+
+
+class CountRanges:
+    """Histogram of per-value occurrence counts over fixed integer ranges"""
+
+    def __init__(self, key, column, upper_bounds):
+        self.key = key
+        self.column = column
+        self.upper_bounds = upper_bounds  # e.g. [10, 20, 30, 40] -> 0-10, 11-20, ..., 41+
+        self.columns = [column]
+
+    def compute(self, df):
+        counts = df[self.column].value_counts(dropna=False).to_numpy()
+        bins = np.searchsorted(self.upper_bounds, counts, side='left')
+        totals = np.bincount(bins, minlength=len(self.upper_bounds) + 1)
+
+        labels = []
+        lower = 0
+        for upper in self.upper_bounds:
+            labels.append(f"{lower}-{upper}")
+            lower = upper + 1
+        labels.append(f"{lower}+")
+        return [{"range": label, "count": int(count)} for label, count in zip(labels, totals)]
+
+
+class RatioBins:
+    """Histogram of numerator / denominator in equal [i/n, (i+1)/n) bins over [0, 1)"""
+
+    def __init__(self, key, numerator, denominator, bins=10):
+        self.key = key
+        self.numerator = numerator
+        self.denominator = denominator
+        self.bins = bins
+        self.columns = [numerator, denominator]
+
+    def compute(self, df):
+        numerator = _floats(df[self.numerator])
+        denominator = _floats(df[self.denominator])
+        valid = denominator > 0
+        fraction = numerator[valid] / denominator[valid]
+
+        edges = np.array([i / self.bins for i in range(self.bins + 1)])
+        bins = np.searchsorted(edges, fraction, side='right') - 1
+        totals = np.bincount(bins[(bins >= 0) & (bins < self.bins)], minlength=self.bins)
+        return [{"range": f"{edges[i]}-{edges[i + 1]}", "count": int(totals[i])} for i in range(self.bins)]
+
+
+def _range_counts(labels, bins, valid):
+    # Several bins can share a label after int() truncation; their counts add up
+    counts = dict.fromkeys(labels, 0)
+    totals = np.bincount(bins[valid], minlength=len(labels))
+    for label, total in zip(labels, totals):
+        counts[label] += int(total)
+    return [{"range": label, "count": count} for label, count in counts.items()]
+
+
+class EqualWidthBins:
+    """Histogram with (bins - 1) equal-width ranges from the minimum plus an open last range"""
+
+    def __init__(self, key, column, bins=6):
+        self.key = key
+        self.column = column
+        self.bins = bins
+        self.columns = [column]
+
+    def compute(self, df):
+        values = _numeric(df[self.column])
+        if len(values) == 0:
+            return []
+        low, high = values.min(), values.max()
+        step = (high - low) / self.bins
+
+        last = self.bins - 1
+        labels = [f"{int(low + i * step)}-{int(low + (i + 1) * step)}" for i in range(last)]
+        labels.append(f"{int(low + last * step)}+")
+
+        edges = np.array([low + i * step for i in range(1, self.bins)])
+        bins = np.searchsorted(edges, values, side='right')
+        return _range_counts(labels, bins, np.ones(len(bins), dtype=bool))
+
+
+class QuantileBins:
+    """Histogram with ranges at the given quantiles, [q_i, q_i+1)"""
+
+    def __init__(self, key, column, quantiles=(0, 0.2, 0.4, 0.6, 0.8, 1.0)):
+        self.key = key
+        self.column = column
+        self.quantiles = list(quantiles)
+        self.columns = [column]
+
+    def compute(self, df):
+        values = _numeric(df[self.column])
+        if len(values) == 0:
+            return []
+        edges = np.quantile(values, self.quantiles)
+        labels = [f"{int(edges[i])}-{int(edges[i + 1])}" for i in range(len(edges) - 1)]
+
+        bins = np.searchsorted(edges, values, side='right') - 1
+        valid = bins < len(labels)
+        return _range_counts(labels, np.minimum(bins, len(labels) - 1), valid)
+
+
+class Scatter:
+    """Points (x, y / x) for rows with 0 < y < x, in table order"""
+
+    def __init__(self, key, x, y, x_label, ratio_label, limit):
+        self.key = key
+        self.x = x
+        self.y = y
+        self.x_label = x_label
+        self.ratio_label = ratio_label
+        self.limit = limit
+        self.columns = [x, y]
+
+    def compute(self, df):
+        x = pd.to_numeric(df[self.x], errors='coerce')
+        y = pd.to_numeric(df[self.y], errors='coerce')
+        keep = (x > 0) & (y > 0) & (y / x < 1)
+        x, y = x[keep].head(self.limit), y[keep].head(self.limit)
+        return [{self.x_label: _clean(a), self.ratio_label: float(b / a)} for a, b in zip(x, y)]
+
+
+class KaplanMeier:
+    """Kaplan-Meier curve of a survival endpoint ('os' or 'dfs')"""
+
+    def __init__(self, key, endpoint):
+        self.key = key
+        months, status, self.event_value = ENDPOINTS[endpoint]
+        # Loaded tables use lower-case column names
+        self.months, self.status = months.lower(), status.lower()
+        self.columns = [self.months, self.status]
+
+    def compute(self, df):
+        durations = _floats(df[self.months])
+        events = df[self.status].to_numpy() == self.event_value
+        keep = ~np.isnan(durations)
+        return km_points(kaplan_meier(durations[keep], events[keep]))
+
+
+def fetch_columns(db, table, columns):
+    """SELECT the given columns of a table into a DataFrame"""
+    result = db.execute(text(f"SELECT {', '.join(columns)} FROM {table}"))
+    return pd.DataFrame(result.fetchall(), columns=columns)
+
+
+def aggregate(db, table, specs, available=None):
+    """Evaluate every spec against one scan of table; returns {spec.key: result}
+
+    When available (the set of columns the table has) is given, missing columns
+    are treated as all NULL; an empty set skips the query altogether.
+    """
+    columns = sorted({column for spec in specs for column in spec.columns})
+    fetched = columns if available is None else [col for col in columns if col in available]
+    df = fetch_columns(db, table, fetched) if fetched else pd.DataFrame()
+    for col in columns:
+        if col not in df.columns:
+            df[col] = pd.Series([None] * len(df), index=df.index, dtype=object)
+    return {spec.key: spec.compute(df) for spec in specs}
@@ -0,0 +1,278 @@
+import os
+import json
+import time
+import shutil
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from sqlalchemy import MetaData, Table, Column, Index, Integer, String, select
+from utils.config import Config
+from utils.database import get_db
+from utils import columnar
+from utils.instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Gene x sample matrices are kept out of SQL: their values live in dense
+# row blocks on disk, and only the gene and sample indexes are tables.
+metadata = MetaData()
+
+array_genes = Table(
+    'array_gene_index', metadata,
+    Column('dataset', String(255), primary_key=True),
+    Column('profile', String(255), primary_key=True),
+    Column('build', String(32), primary_key=True),
+    Column('position', Integer, primary_key=True),  # row in the matrix
+    Column('hugo_symbol', String(255)),
+    Column('entrez_gene_id', Integer),
+    Index('ix_array_gene_index_symbol', 'dataset', 'profile', 'hugo_symbol'),
+)
+
+array_samples = Table(
+    'array_sample_index', metadata,
+    Column('dataset', String(255), primary_key=True),
+    Column('profile', String(255), primary_key=True),
+    Column('build', String(32), primary_key=True),
+    Column('position', Integer, primary_key=True),  # column in the matrix
+    Column('sample_id', String(255)),
+    Index('ix_array_sample_index_sample', 'dataset', 'profile', 'sample_id'),
+)
+
+
+def ensure_index_tables(bind):
+    metadata.create_all(bind, tables=[array_genes, array_samples], checkfirst=True)
+
+
+def store_root(file_path):
+    """Directory of the store built from a matrix CSV; each build gets a subdirectory"""
+    directory, file_name = os.path.split(file_path)
+    return os.path.join(directory, Config.ARRAY_STORE_DIR_NAME, os.path.splitext(file_name)[0])
+
+
+def _block_path(directory, block):
+    return os.path.join(directory, f"block_{block:05d}.npy")
+
+
+def _read_current(root):
+    try:
+        with open(os.path.join(root, 'current.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _entrez(value):
+    return None if pd.isna(value) else int(value)
+
+
+def build_store(engine, file_path, dataset_name):
+    """Write a gene x sample CSV as blocks of Config.ARRAY_BLOCK_ROWS genes and index it in SQL.
+
+    The CSV is read one block at a time. A new build only becomes visible when
+    current.json points at it, after its index rows are committed; the previous
+    build is removed afterwards. Returns the number of genes stored.
+    """
+    profile = os.path.splitext(os.path.basename(file_path))[0]
+    root = store_root(file_path)
+    build = f"{time.time_ns():x}"
+    directory = os.path.join(root, build)
+    os.makedirs(directory)
+
+    header = pd.read_csv(file_path, nrows=0)
+    id_columns = [col for col in columnar.MATRIX_ID_COLUMNS if col in header.columns]
+    samples = [col for col in header.columns if col not in id_columns]
+
+    gene_rows = []
+    blocks = 0
+    for chunk in pd.read_csv(file_path, chunksize=Config.ARRAY_BLOCK_ROWS,
+                             na_values=['Not Available'], on_bad_lines='skip'):
+        values = chunk[samples].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=Config.ARRAY_STORE_DTYPE)
+        np.save(_block_path(directory, blocks), values)
+        blocks += 1
+        entrez = chunk['Entrez_Gene_Id'] if 'Entrez_Gene_Id' in chunk.columns else [None] * len(chunk)
+        for symbol, entrez_id in zip(chunk['Hugo_Symbol'].astype(str), entrez):
+            gene_rows.append({'dataset': dataset_name, 'profile': profile, 'build': build,
+                              'position': len(gene_rows), 'hugo_symbol': symbol,
+                              'entrez_gene_id': _entrez(entrez_id)})
+
+    sample_rows = [{'dataset': dataset_name, 'profile': profile, 'build': build,
+                    'position': i, 'sample_id': sample} for i, sample in enumerate(samples)]
+    with engine.begin() as conn:
+        ensure_index_tables(conn)
+        if gene_rows:
+            conn.execute(array_genes.insert(), gene_rows)
+        if sample_rows:
+            conn.execute(array_samples.insert(), sample_rows)
+
+    columnar._write_json(os.path.join(root, 'current.json'), {
+        'build': build,
+        'dataset': dataset_name,
+        'profile': profile,
+        'genes': len(gene_rows),
+        'samples': len(samples),
+        'block_rows': Config.ARRAY_BLOCK_ROWS,
+        'blocks': blocks,
+    })
+    logger.info(f"Stored {file_path} as {len(gene_rows)} genes x {len(samples)} samples in {blocks} blocks")
+
+    # Retire earlier builds; processes still reading them keep their open maps
+    with engine.begin() as conn:
+        for index_table in (array_genes, array_samples):
+            conn.execute(index_table.delete().where(
+                (index_table.c.dataset == dataset_name) & (index_table.c.profile == profile)
+                & (index_table.c.build != build)))
+    for name in os.listdir(root):
+        if name != build and os.path.isdir(os.path.join(root, name)):
+            shutil.rmtree(os.path.join(root, name), ignore_errors=True)
+    return len(gene_rows)
+
+
+class ArrayStore:
+    """Read access to one build of a stored matrix.
+
+    Blocks are memory-mapped, so get_rows touches only the requested genes and
+    get_cols only the requested sample columns of each block. Both return
+    float64 DataFrames indexed by Hugo_Symbol with samples as columns.
+    """
+
+    def __init__(self, directory, current, genes, samples):
+        self.build = current['build']
+        self.block_rows = current['block_rows']
+        self.genes = genes
+        self.samples = samples
+        self._gene_rows = {}
+        for row, gene in enumerate(genes):
+            self._gene_rows.setdefault(gene, []).append(row)
+        self._sample_cols = {sample: col for col, sample in enumerate(samples)}
+        # Opened up front: a later rebuild may delete these files, open maps stay valid
+        self._blocks = [np.load(_block_path(directory, block), mmap_mode='r')
+                        for block in range(current['blocks'])]
+
+    def _columns(self, samples):
+        if samples is None:
+            return slice(None), self.samples
+        samples = [sample for sample in samples if sample in self._sample_cols]
+        return [self._sample_cols[sample] for sample in samples], samples
+
+    @stage('array_read')
+    def get_rows(self, genes, samples=None):
+        """Rows of the given genes (all rows of a repeated symbol, in request order)"""
+        cols, labels = self._columns(samples)
+        index, parts = [], []
+        for gene in genes:
+            for row in self._gene_rows.get(gene, []):
+                block, offset = divmod(row, self.block_rows)
+                parts.append(np.asarray(self._blocks[block][offset][cols], dtype=np.float64))
+                index.append(gene)
+        data = np.vstack(parts) if parts else np.empty((0, len(labels)))
+        return pd.DataFrame(data, index=pd.Index(index, name='Hugo_Symbol'), columns=labels)
+
+    @stage('array_read')
+    def head(self, n_genes, n_samples):
+        """The first genes x samples of the matrix, in file order"""
+        parts, rows = [], 0
+        for block in self._blocks:
+            if rows >= n_genes:
+                break
+            part = np.asarray(block[:n_genes - rows, :n_samples], dtype=np.float64)
+            parts.append(part)
+            rows += len(part)
+        labels = self.samples[:n_samples]
+        data = np.vstack(parts) if parts else np.empty((0, len(labels)))
+        return pd.DataFrame(data, index=pd.Index(self.genes[:rows], name='Hugo_Symbol'), columns=labels)
+
+    @stage('array_read')
+    def get_cols(self, samples):
+        """Every gene for the given samples"""
+        cols, labels = self._columns(samples)
+        parts = [np.asarray(block[:, cols], dtype=np.float64) for block in self._blocks]
+        data = np.vstack(parts) if parts else np.empty((0, len(labels)))
+        return pd.DataFrame(data, index=pd.Index(self.genes, name='Hugo_Symbol'), columns=labels)
+
+    @stage('array_read')
+    def values(self):
+        """The whole matrix as one array, in the stored dtype"""
+        if not self._blocks:
+            return np.empty((0, len(self.samples)), dtype=Config.ARRAY_STORE_DTYPE)
+        return np.vstack(self._blocks)
+
+
+# Open stores by root directory, replaced when current.json points at a new build
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def _load_index(db, current):
+    key = {'dataset': current['dataset'], 'profile': current['profile'], 'build': current['build']}
+    genes = db.execute(
+        select(array_genes.c.hugo_symbol).filter_by(**key).order_by(array_genes.c.position)
+    ).scalars().all()
+    samples = db.execute(
+        select(array_samples.c.sample_id).filter_by(**key).order_by(array_samples.c.position)
+    ).scalars().all()
+    return genes, samples
+
+
+def open_store(dataset_name, profile):
+    """The current ArrayStore of a dataset's matrix file, or None if it was never stored"""
+    root = store_root(columnar.dataset_file(dataset_name, profile))
+    for attempt in range(2):
+        current = _read_current(root)
+        if current is None:
+            return None
+        with _stores_lock:
+            store = _stores.get(root)
+        if store is not None and store.build == current['build']:
+            return store
+
+        db = next(get_db())
+        try:
+            genes, samples = _load_index(db, current)
+        finally:
+            db.close()
+        try:
+            store = ArrayStore(os.path.join(root, current['build']), current, genes, samples)
+        except FileNotFoundError:
+            # Replaced between reading current.json and opening the blocks; retry once
+            continue
+        with _stores_lock:
+            _stores[root] = store
+        return store
+    return None
+
+
+def matrix_version(dataset_name, profile):
+    """Changes whenever the data read_matrix returns does; for cache keys"""
+    store = open_store(dataset_name, profile)
+    if store is not None:
+        return ('store', store.build)
+    stat = os.stat(columnar.dataset_file(dataset_name, profile))
+    return ('csv', stat.st_mtime, stat.st_size)
+
+
+def read_matrix(dataset_name, profile):
+    """(genes, samples, values) of a whole matrix, for genome-wide computations.
+
+    Reads the array store, or the columnar mirror until the file is stored.
+    """
+    store = open_store(dataset_name, profile)
+    if store is not None:
+        return store.genes, store.samples, store.values()
+
+    file_path = columnar.dataset_file(dataset_name, profile)
+    directory = columnar.ensure_mirror(file_path)
+    with open(os.path.join(directory, 'genes.json')) as f:
+        genes = json.load(f)
+    with open(os.path.join(directory, 'samples.json')) as f:
+        samples = json.load(f)
+    values = np.load(os.path.join(directory, 'values.npy'))
+    return genes, samples, values
+
+
+def read_gene_rows(dataset_name, profile, genes):
+    """Rows of the given genes from the array store, or from the CSV until the file is stored"""
+    store = open_store(dataset_name, profile)
+    if store is None:
+        return columnar.read_gene_rows(columnar.dataset_file(dataset_name, profile), genes)
+    return store.get_rows(genes)
@@ -0,0 +1,135 @@
+import os
+import logging
+import tempfile
+import pandas as pd
+from sqlalchemy import table, column
+from sqlalchemy.exc import SQLAlchemyError
+
+logger = logging.getLogger(__name__)
+
+# Rows per executemany batch; capped so a batch never exceeds MAX_BIND_PARAMS values
+MULTI_ROW_BATCH = int(os.environ.get('BULK_INSERT_BATCH', 2000))
+MAX_BIND_PARAMS = 30000
+
+# Rows formatted per write when producing the LOAD DATA file
+TSV_CHUNK_ROWS = 50000
+
+
+def _batches(df, rows):
+    for start in range(0, len(df), rows):
+        yield df.iloc[start:start + rows]
+
+
+def _records(df):
+    """Rows as tuples of Python scalars, with NaN -> None"""
+    frame = df.astype(object).where(df.notna(), None)
+    return list(frame.itertuples(index=False, name=None))
+
+
+class ToSqlLoader:
+    """pandas to_sql in chunks of 1000 rows (the original loader, kept as a baseline)"""
+    name = 'to_sql'
+
+    def load(self, engine, df, table_name):
+        df.to_sql(name=table_name, con=engine, if_exists='append', index=False, chunksize=1000)
+        return len(df)
+
+
+class MultiRowInsertLoader:
+    """Batched executemany of one INSERT in a single transaction.
+
+    PyMySQL rewrites an executemany INSERT into multi-row INSERT ... VALUES (...), (...)
+    statements, so each batch costs a handful of round trips instead of one per row.
+    """
+    name = 'multi_row_insert'
+
+    def __init__(self, batch_size=MULTI_ROW_BATCH):
+        self.batch_size = batch_size
+
+    def load(self, engine, df, table_name):
+        columns = list(df.columns)
+        target = table(table_name, *[column(col) for col in columns])
+        rows = max(1, min(self.batch_size, MAX_BIND_PARAMS // max(len(columns), 1)))
+        with engine.begin() as conn:
+            for batch in _batches(df, rows):
+                conn.execute(target.insert(), [dict(zip(columns, record)) for record in _records(batch)])
+        return len(df)
+
+
+class SQLiteLoader:
+    """executemany of one prepared INSERT on the raw sqlite3 cursor, for local testing"""
+    name = 'sqlite_executemany'
+
+    def load(self, engine, df, table_name):
+        columns = ', '.join(f'"{col}"' for col in df.columns)
+        placeholders = ', '.join('?' * len(df.columns))
+        statement = f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders})'
+        with engine.begin() as conn:
+            for batch in _batches(df, TSV_CHUNK_ROWS):
+                conn.exec_driver_sql(statement, _records(batch))
+        return len(df)
+
+
+def _escape_tsv(series):
+    """Format a column for LOAD DATA: backslash escapes and \\N for NULL"""
+    if pd.api.types.is_bool_dtype(series):
+        text = series.astype(int).astype(str)
+    else:
+        text = series.astype(str)
+        if series.dtype == object:
+            text = (text.str.replace('\\', '\\\\', regex=False)
+                        .str.replace('\t', '\\t', regex=False)
+                        .str.replace('\n', '\\n', regex=False)
+                        .str.replace('\r', '\\r', regex=False))
+    return text.where(series.notna(), '\\N')
+
+
+def write_tsv(df, f):
+    """Write df (no header) in the format LOAD DATA's default FIELDS/LINES options expect"""
+    for batch in _batches(df, TSV_CHUNK_ROWS):
+        cells = pd.concat([_escape_tsv(batch[col]) for col in batch.columns], axis=1).to_numpy()
+        f.write(''.join('\t'.join(row) + '\n' for row in cells))
+
+
+class MySQLLoadDataLoader:
+    """LOAD DATA LOCAL INFILE from a temporary TSV file.
+
+    Needs local_infile enabled on the client (dataloader.get_engine does this) and
+    on the server; if the server refuses, falls back to multi-row INSERTs.
+    """
+    name = 'mysql_load_data'
+
+    def load(self, engine, df, table_name):
+        fd, path = tempfile.mkstemp(suffix='.tsv', prefix=f"{table_name}_")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8', newline='') as f:
+                write_tsv(df, f)
+            columns = ', '.join(f"`{col}`" for col in df.columns)
+            file_name = path.replace('\\', '/').replace("'", "\\'")
+            statement = (f"LOAD DATA LOCAL INFILE '{file_name}' INTO TABLE `{table_name}` "
+                         f"CHARACTER SET utf8mb4 ({columns})")
+            try:
+                with engine.begin() as conn:
+                    conn.exec_driver_sql(statement)
+            except SQLAlchemyError as e:
+                logger.warning(f"LOAD DATA into {table_name} failed ({e}); using multi-row INSERT")
+                return MultiRowInsertLoader().load(engine, df, table_name)
+        finally:
+            os.remove(path)
+        return len(df)
+
+
+# Fastest strategy per SQLAlchemy dialect; anything else gets multi-row INSERTs
+DIALECT_LOADERS = {
+    'mysql': MySQLLoadDataLoader,
+    'sqlite': SQLiteLoader,
+}
+
+LOADERS = {loader.name: loader for loader in (ToSqlLoader, MultiRowInsertLoader, SQLiteLoader, MySQLLoadDataLoader)}
+
+
+def get_loader(engine, strategy=None):
+    """Bulk loader for engine's dialect, or the named strategy (see LOADERS)"""
+    if strategy:
+        return LOADERS[strategy]()
+    return DIALECT_LOADERS.get(engine.dialect.name, MultiRowInsertLoader)()
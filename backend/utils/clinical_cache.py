@@ -0,0 +1,119 @@
+import os
+import threading
+import logging
+from collections import OrderedDict
+import pandas as pd
+from utils.config import Config
+from utils import columnar
+from utils.instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# cBioPortal placeholders such as "[Not Available]" or "[Not Applicable]"
+SENTINEL_PATTERN = r'^\[.*\]$'
+
+
+def _source_files(dataset_name):
+    return [columnar.dataset_file(dataset_name, file_type) for file_type in columnar.CLINICAL_FILES]
+
+
+def source_signature(dataset_name):
+    """(mtime, size) of the clinical files; changes whenever a file is replaced"""
+    signature = []
+    for file_path in _source_files(dataset_name):
+        stat = os.stat(file_path)
+        signature.append((stat.st_mtime, stat.st_size))
+    return tuple(signature)
+
+
+def _to_typed(series):
+    """Convert a column to numbers when every non-placeholder value is numeric"""
+    if series.dtype != object:
+        return series
+    values = series.where(~series.astype(str).str.match(SENTINEL_PATTERN))
+    numeric = pd.to_numeric(values, errors='coerce')
+    if numeric.notna().sum() == values.notna().sum() and numeric.notna().any():
+        return numeric
+    return series
+
+
+def build_clinical_frame(dataset_name):
+    """Join the sample and patient files into one typed frame indexed by SAMPLE_ID"""
+    patient_file, sample_file = _source_files(dataset_name)
+    with stage('csv_parse'):
+        patient_data = columnar.read_columns(patient_file)
+        sample_data = columnar.read_columns(sample_file)
+
+    # Columns present in both files (other than the key) keep the sample value
+    overlap = [col for col in patient_data.columns if col in sample_data.columns and col != 'PATIENT_ID']
+    patient_data = patient_data.drop(columns=overlap)
+
+    with stage('merge'):
+        frame = pd.merge(sample_data, patient_data, on='PATIENT_ID', how='left')
+        frame = frame.drop_duplicates(subset='SAMPLE_ID').set_index('SAMPLE_ID', drop=False)
+        frame.index.name = None
+        return frame.apply(_to_typed)
+
+
+class ClinicalFrameCache:
+    """Process-wide LRU cache of joined clinical frames, bounded by memory"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()  # dataset -> (signature, frame, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, dataset_name):
+        signature = source_signature(dataset_name)
+        with self._lock:
+            entry = self._entries.get(dataset_name)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                self._entries.move_to_end(dataset_name)
+                return entry[1]
+            self.misses += 1
+
+        # Build outside the lock so one slow dataset does not block the others
+        frame = build_clinical_frame(dataset_name)
+        nbytes = int(frame.memory_usage(deep=True).sum())
+
+        with self._lock:
+            self._entries[dataset_name] = (signature, frame, nbytes)
+            self._entries.move_to_end(dataset_name)
+            self._evict()
+        return frame
+
+    def _evict(self):
+        total = sum(entry[2] for entry in self._entries.values())
+        # Always keep the most recently used frame, even if it alone exceeds the bound
+        while total > self.max_bytes and len(self._entries) > 1:
+            dataset_name, (_, _, nbytes) = self._entries.popitem(last=False)
+            total -= nbytes
+            logger.info(f"Evicted clinical frame for {dataset_name} ({nbytes} bytes)")
+
+    def invalidate(self, dataset_name=None):
+        with self._lock:
+            if dataset_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(dataset_name, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "datasets": list(self._entries.keys()),
+                "bytes": sum(entry[2] for entry in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
+
+
+clinical_cache = ClinicalFrameCache(Config.CLINICAL_CACHE_MAX_BYTES)
+
+
+def get_clinical_frame(dataset_name):
+    """Joined sample/patient frame for a dataset, indexed by SAMPLE_ID"""
+    return clinical_cache.get(dataset_name)
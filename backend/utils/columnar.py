@@ -0,0 +1,252 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+import numpy as np
+import pandas as pd
+from utils.config import Config
+from utils import row_index
+from utils.instrumentation import stage
+
+logger = logging.getLogger(__name__)
+
+# Bump when the on-disk layout changes so stale mirrors get rebuilt
+FORMAT_VERSION = 2
+
+# Gene x sample matrix files (first column Hugo_Symbol, one column per sample)
+MATRIX_PREFIXES = ('data_methylation', 'data_mrna', 'data_cna', 'data_linear_cna')
+MATRIX_ID_COLUMNS = ['Hugo_Symbol', 'Entrez_Gene_Id']
+
+# Clinical files stored column by column
+CLINICAL_FILES = ('data_clinical_patient', 'data_clinical_sample')
+
+
+def dataset_file(dataset_name, file_type):
+    """Return the path of a dataset CSV file, e.g. ('brca_tcga_pub2015', 'data_clinical_patient')"""
+    return os.path.join(Config.DATASETS_DIR, dataset_name, f"{file_type}.csv")
+
+
+def is_matrix_file(file_path):
+    """True if the file is a gene x sample matrix"""
+    return os.path.basename(file_path).startswith(MATRIX_PREFIXES)
+
+
+def mirror_dir(file_path):
+    """Directory holding the binary mirror of a CSV file"""
+    directory, file_name = os.path.split(file_path)
+    return os.path.join(directory, Config.COLUMNAR_DIR_NAME, os.path.splitext(file_name)[0])
+
+
+def file_hash(file_path, block_size=1 << 20):
+    """SHA-1 of a file's contents"""
+    digest = hashlib.sha1()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_manifest(directory):
+    try:
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _tmp_path(path):
+    # Unique per writer so concurrent builds never share a temp file
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _write_json(path, obj):
+    # Write to a temp file and rename so readers never see a half-written file
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'w') as f:
+        json.dump(obj, f)
+    os.replace(tmp_path, path)
+
+
+def _write_npy(path, values):
+    # Same for .npy blocks, which other requests may have memory-mapped
+    tmp_path = _tmp_path(path)
+    with open(tmp_path, 'wb') as f:
+        np.save(f, values)
+    os.replace(tmp_path, path)
+
+
+# One build at a time per source file
+_build_locks = {}
+_build_locks_lock = threading.Lock()
+
+
+def _build_lock(file_path):
+    with _build_locks_lock:
+        return _build_locks.setdefault(os.path.abspath(file_path), threading.Lock())
+
+
+def is_fresh(file_path):
+    """Check whether the mirror of file_path matches the source file.
+
+    mtime and size are compared first; the content hash is only computed when
+    they differ, so a touched-but-unchanged file does not trigger a rebuild.
+    """
+    directory = mirror_dir(file_path)
+    manifest = _read_manifest(directory)
+    if not manifest or manifest.get('format_version') != FORMAT_VERSION:
+        return False
+
+    stat = os.stat(file_path)
+    if manifest['mtime'] == stat.st_mtime and manifest['size'] == stat.st_size:
+        return True
+    if manifest.get('stale') == [stat.st_mtime, stat.st_size]:
+        # Already hashed this version of the file and it differed
+        return False
+
+    if manifest['size'] == stat.st_size:
+        if manifest['sha1'] == file_hash(file_path):
+            manifest['mtime'] = stat.st_mtime
+            manifest.pop('stale', None)
+            _write_json(os.path.join(directory, 'manifest.json'), manifest)
+            return True
+        # Remember the result so request-path callers do not re-hash the file every time
+        manifest['stale'] = [stat.st_mtime, stat.st_size]
+        _write_json(os.path.join(directory, 'manifest.json'), manifest)
+    return False
+
+
+def _finish_mirror(file_path, directory, kind):
+    stat = os.stat(file_path)
+    _write_json(os.path.join(directory, 'manifest.json'), {
+        'format_version': FORMAT_VERSION,
+        'kind': kind,
+        'source': os.path.abspath(file_path),
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'sha1': file_hash(file_path),
+    })
+
+
+def convert_matrix(file_path):
+    """Write a gene x sample CSV as a float64 .npy block plus a gene -> row index"""
+    directory = mirror_dir(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    df = pd.read_csv(file_path, na_values=['Not Available'], on_bad_lines='skip')
+    id_columns = [col for col in MATRIX_ID_COLUMNS if col in df.columns]
+    samples = [col for col in df.columns if col not in id_columns]
+
+    # float64 so values read back exactly as parsed from the CSV
+    values = df[samples].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float64)
+    _write_npy(os.path.join(directory, 'values.npy'), values)
+
+    genes = df['Hugo_Symbol'].astype(str).tolist()
+    gene_index = {}
+    for row, gene in enumerate(genes):
+        gene_index.setdefault(gene, []).append(row)
+
+    _write_json(os.path.join(directory, 'genes.json'), genes)
+    _write_json(os.path.join(directory, 'samples.json'), samples)
+    _write_json(os.path.join(directory, 'index.json'), gene_index)
+    _finish_mirror(file_path, directory, 'matrix')
+    logger.info(f"Wrote columnar mirror for {file_path}: {values.shape[0]} genes x {values.shape[1]} samples")
+
+
+def convert_table(file_path):
+    """Write a clinical CSV one column per .npy file"""
+    directory = mirror_dir(file_path)
+    os.makedirs(directory, exist_ok=True)
+
+    df = pd.read_csv(file_path, on_bad_lines='skip')
+    columns = []
+    for i, col in enumerate(df.columns):
+        series = df[col]
+        if pd.api.types.is_numeric_dtype(series):
+            values = series.to_numpy(dtype=np.float64)
+        else:
+            # Missing values become empty strings and are restored to NaN on read
+            values = series.fillna('').astype(str).to_numpy(dtype=str)
+        _write_npy(os.path.join(directory, f"{i}.npy"), values)
+        columns.append(col)
+
+    _write_json(os.path.join(directory, 'columns.json'), columns)
+    _finish_mirror(file_path, directory, 'table')
+    logger.info(f"Wrote columnar mirror for {file_path}: {len(df)} rows x {len(columns)} columns")
+
+
+def ensure_mirror(file_path):
+    """Build (or rebuild) the mirror of file_path if it is missing or stale"""
+    if is_fresh(file_path):
+        return mirror_dir(file_path)
+    with _build_lock(file_path):
+        # Another request may have built it while we waited
+        if not is_fresh(file_path):
+            if is_matrix_file(file_path):
+                convert_matrix(file_path)
+            else:
+                convert_table(file_path)
+    return mirror_dir(file_path)
+
+
+def convert_dataset(dataset_path):
+    """Mirror every matrix and clinical file of a dataset directory"""
+    for file_name in sorted(os.listdir(dataset_path)):
+        file_path = os.path.join(dataset_path, file_name)
+        file_type = os.path.splitext(file_name)[0]
+        if not file_name.endswith('.csv'):
+            continue
+        if is_matrix_file(file_path) or file_type in CLINICAL_FILES:
+            try:
+                ensure_mirror(file_path)
+            except Exception as e:
+                logger.error(f"Error writing columnar mirror for {file_path}: {e}")
+
+
+def read_gene_rows(file_path, genes):
+    """Return the matrix rows of the given genes as a DataFrame (Hugo_Symbol x samples).
+
+    Only the requested rows are touched: the value block of a fresh mirror is
+    memory-mapped, otherwise the rows are read from the CSV through its byte-offset
+    index so a request never waits for a full conversion.
+    """
+    if not is_fresh(file_path):
+        with stage('csv_parse'):
+            return row_index.read_rows(file_path, genes, MATRIX_ID_COLUMNS).astype(np.float64)
+
+    directory = mirror_dir(file_path)
+    with open(os.path.join(directory, 'index.json')) as f:
+        gene_index = json.load(f)
+    with open(os.path.join(directory, 'samples.json')) as f:
+        samples = json.load(f)
+
+    values = np.load(os.path.join(directory, 'values.npy'), mmap_mode='r')
+    labels, rows = [], []
+    for gene in genes:
+        for row in gene_index.get(gene, []):
+            labels.append(gene)
+            rows.append(row)
+
+    data = np.asarray(values[rows], dtype=np.float64) if rows else np.empty((0, len(samples)))
+    return pd.DataFrame(data, index=pd.Index(labels, name='Hugo_Symbol'), columns=samples)
+
+
+def read_columns(file_path, columns=None):
+    """Return the requested columns of a mirrored clinical file as a DataFrame"""
+    directory = ensure_mirror(file_path)
+    with open(os.path.join(directory, 'columns.json')) as f:
+        all_columns = json.load(f)
+    if columns is None:
+        columns = all_columns
+
+    data = {}
+    for col in columns:
+        if col not in all_columns:
+            continue
+        values = np.load(os.path.join(directory, f"{all_columns.index(col)}.npy"))
+        if values.dtype.kind == 'U':
+            series = pd.Series(values, dtype=object)
+            data[col] = series.where(series != '', np.nan)
+        else:
+            data[col] = values
+    return pd.DataFrame(data)
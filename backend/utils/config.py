@@ -6,10 +6,53 @@ class Config:
     MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
     MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
     MYSQL_DB = os.environ.get('MYSQL_DB', 'cancer_db')  # Updated database name here
+    DATABASE_URL = os.environ.get('DATABASE_URL', '')  # overrides the MySQL settings, e.g. sqlite:////tmp/bench.db
     
+    # Connection pool (see utils/database.py); size it for the number of concurrent requests
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+    DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 30))  # seconds to wait for a connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 3600))  # below MySQL's wait_timeout
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'True') == 'True'
+
+    # Query instrumentation (utils/database.py): per-request budget and slow-query EXPLAIN capture
+    QUERY_BUDGET = int(os.environ.get('QUERY_BUDGET', 50))  # statements per request before it is flagged
+    SLOW_QUERY_SECONDS = float(os.environ.get('SLOW_QUERY_SECONDS', 0.5))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', './logs/slow_queries.log')
+
     # Flask configuration
     SECRET_KEY = os.environ.get('SECRET_KEY', 'dev_key_for_development')
     DEBUG = os.environ.get('DEBUG', 'True') == 'True'
     
+    # Dataset files
+    DATASETS_DIR = os.environ.get('DATASETS_DIR', './datasets')
+    COLUMNAR_DIR_NAME = '.columnar'  # per-dataset binary mirror of the CSV files
+    CLUSTER_CACHE_DIR = os.environ.get('CLUSTER_CACHE_DIR', os.path.join(DATASETS_DIR, '.cluster_cache'))
+    CLUSTER_CACHE_ENTRIES = int(os.environ.get('CLUSTER_CACHE_ENTRIES', 64))  # dendrograms kept in memory
+    CLUSTER_CACHE_MAX_FILES = int(os.environ.get('CLUSTER_CACHE_MAX_FILES', 1024))  # and on disk
+    ARRAY_STORE_DIR_NAME = '.arrays'  # per-dataset gene x sample block store (utils/array_store.py)
+    ARRAY_BLOCK_ROWS = int(os.environ.get('ARRAY_BLOCK_ROWS', 4096))  # genes per block file
+    ARRAY_STORE_DTYPE = os.environ.get('ARRAY_STORE_DTYPE', 'float32')
+    CLINICAL_CACHE_MAX_BYTES = int(os.environ.get('CLINICAL_CACHE_MAX_BYTES', 512 * 1024 * 1024))
+
+    # Summary page: sections computed in parallel, each on its own pooled connection
+    SUMMARY_WORKERS = int(os.environ.get('SUMMARY_WORKERS', 4))
+    SUMMARY_DEADLINE = float(os.environ.get('SUMMARY_DEADLINE', 20))  # seconds before partial results
+
+    # Standardized matrices kept for the correlation engine (one per dataset, profile and method)
+    CORRELATION_CACHE_ENTRIES = int(os.environ.get('CORRELATION_CACHE_ENTRIES', 4))
+
+    # Whole matrices kept for differential analysis
+    DIFFERENTIAL_CACHE_ENTRIES = int(os.environ.get('DIFFERENTIAL_CACHE_ENTRIES', 2))
+
+    # Most genes one batch analysis request may ask for
+    BATCH_MAX_GENES = int(os.environ.get('BATCH_MAX_GENES', 500))
+
+    # Background analysis jobs (utils/jobs.py): worker processes and stored results
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOBS_DIR = os.environ.get('JOBS_DIR', os.path.join(DATASETS_DIR, '.jobs'))
+    JOB_RESULTS_MAX_FILES = int(os.environ.get('JOB_RESULTS_MAX_FILES', 256))
+    JOB_RETENTION = int(os.environ.get('JOB_RETENTION', 3600))  # seconds finished jobs stay listed
+
     # Other application settings
     ITEMS_PER_PAGE = 20
\ No newline at end of file
@@ -0,0 +1,169 @@
+import logging
+import numpy as np
+from scipy import stats
+from utils.config import Config
+from utils.array_store import matrix_version, read_gene_rows, read_matrix
+from utils.multiple_testing import bh_adjust
+from utils.survival import ResultCache
+
+logger = logging.getLogger(__name__)
+
+METHODS = ('pearson', 'spearman')
+
+# Fewer paired samples than this give no correlation
+MIN_PAIRED_SAMPLES = 3
+
+
+def _rank_rows(values):
+    """Average ranks within each row, over its measured values (NaN stays NaN)"""
+    return stats.rankdata(values, axis=1, nan_policy='omit')
+
+
+class StandardizedMatrix:
+    """A gene x sample matrix z-scored per gene, ready for correlating one gene against all.
+
+    Each row is centred and scaled over its measured samples and missing values
+    are set to 0. With no missing values, correlations with a gene are one
+    matrix-vector product; otherwise the per-pair sums over the samples both
+    genes measured are a few more, so every pair uses exactly its shared samples.
+    For Spearman the rows are ranked first (ranks over each gene's measured samples).
+    """
+
+    def __init__(self, genes, samples, values, method):
+        values = np.asarray(values, dtype=np.float64)
+        if method == 'spearman':
+            values = _rank_rows(values)
+        mask = ~np.isnan(values)
+        counts = mask.sum(axis=1)
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean = np.where(mask, values, 0).sum(axis=1) / counts
+            centered = np.where(mask, values - mean[:, None], 0)
+            std = np.sqrt((centered ** 2).sum(axis=1) / counts)
+            z = np.where(std[:, None] > 0, centered / std[:, None], 0)
+
+        self.genes = list(genes)
+        self.samples = list(samples)
+        self.complete = bool(mask.all())
+        self.z = z.astype(np.float32)
+        self.mask = None if self.complete else mask.astype(np.float32)
+        self.z2 = None if self.complete else (z ** 2).astype(np.float32)
+        self.rows = {}
+        for row, gene in enumerate(self.genes):
+            self.rows.setdefault(gene, row)  # repeated symbols: the first row stands for the gene
+
+    def correlate(self, row):
+        """(r, n): correlation of every gene with the gene at row, and the paired sample counts"""
+        y = self.z[row].astype(np.float64)
+        if self.complete:
+            n = np.full(len(self.genes), len(self.samples), dtype=np.float64)
+            r = (self.z @ y) / len(self.samples)
+        else:
+            m = self.mask[row].astype(np.float64)
+            n = self.mask @ m
+            sx = self.z @ m
+            sy = self.mask @ y
+            sxx = self.z2 @ m
+            syy = self.mask @ (y * y)
+            sxy = self.z @ y
+            with np.errstate(invalid='ignore', divide='ignore'):
+                r = (n * sxy - sx * sy) / np.sqrt((n * sxx - sx ** 2) * (n * syy - sy ** 2))
+        r = np.where(n >= MIN_PAIRED_SAMPLES, np.clip(r, -1, 1), np.nan)
+        return r, n
+
+
+def correlation_p_values(r, n):
+    """Two-sided p-values of correlations r over n paired samples (t test, n - 2 df)"""
+    df = n - 2
+    with np.errstate(invalid='ignore', divide='ignore'):
+        t = r * np.sqrt(df / (1 - r ** 2))
+        p = 2 * stats.t.sf(np.abs(t), df)
+    return np.where(np.abs(r) >= 1, 0.0, p)
+
+
+# Standardized matrices by (dataset, profile, method, data version)
+_matrices = ResultCache(maxsize=Config.CORRELATION_CACHE_ENTRIES)
+
+
+def standardized_matrix(dataset_name, profile, method):
+    key = (dataset_name, profile, method, matrix_version(dataset_name, profile))
+
+    def compute():
+        genes, samples, values = read_matrix(dataset_name, profile)
+        logger.info(f"Standardizing {profile} of {dataset_name} for {method} ({len(genes)} x {len(samples)})")
+        return StandardizedMatrix(genes, samples, values, method)
+
+    return _matrices.get_or_compute(key, compute)
+
+
+def _check_method(method):
+    if method not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+
+
+def top_correlated(dataset_name, profile, gene, method='pearson', k=20):
+    """The k genes most correlated with gene (by |r|), with p-values and BH q-values.
+
+    q-values are adjusted over every gene tested against gene. Raises KeyError
+    if the gene is not in the profile.
+    """
+    _check_method(method)
+    matrix = standardized_matrix(dataset_name, profile, method)
+    if gene not in matrix.rows:
+        raise KeyError(gene)
+
+    r, n = matrix.correlate(matrix.rows[gene])
+    # Leave out the gene itself (all rows of its symbol)
+    r[[row for row, symbol in enumerate(matrix.genes) if symbol == gene]] = np.nan
+    p = correlation_p_values(r, n)
+    q = bh_adjust(p)
+
+    tested = np.flatnonzero(~np.isnan(r))
+    k = min(k, len(tested))
+    top = tested[np.argpartition(-np.abs(r[tested]), k - 1)[:k]] if k else tested[:0]
+    top = top[np.argsort(-np.abs(r[top]), kind='stable')]
+    return {
+        "gene": gene,
+        "method": method,
+        "tested": int(len(tested)),
+        "results": [
+            {
+                "gene": matrix.genes[row],
+                "r": float(r[row]),
+                "n": int(n[row]),
+                "pValue": float(p[row]),
+                "qValue": float(q[row]),
+            }
+            for row in top
+        ],
+    }
+
+
+def paired_values(dataset_name, profile, gene_a, gene_b, method='pearson'):
+    """The two genes' values on the samples where both are measured, with their correlation.
+
+    Raises KeyError for a gene that is not in the profile.
+    """
+    _check_method(method)
+    rows = read_gene_rows(dataset_name, profile, [gene_a, gene_b])
+    rows = rows[~rows.index.duplicated()]
+    for gene in (gene_a, gene_b):
+        if gene not in rows.index:
+            raise KeyError(gene)
+
+    x, y = rows.loc[gene_a], rows.loc[gene_b]
+    paired = x.notna() & y.notna()
+    x, y = x[paired], y[paired]
+
+    r = p = None
+    if len(x) >= MIN_PAIRED_SAMPLES and x.nunique() > 1 and y.nunique() > 1:
+        test = stats.pearsonr if method == 'pearson' else stats.spearmanr
+        r, p = (float(v) for v in test(x, y))
+    return {
+        "samples": x.index.tolist(),
+        "x": x.tolist(),
+        "y": y.tolist(),
+        "r": r,
+        "pValue": p,
+        "n": int(len(x)),
+    }
@@ -1,13 +1,243 @@
-from sqlalchemy import create_engine
+import os
+import re
+import time
+import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from flask import g, request
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, scoped_session
+from sqlalchemy.pool import QueuePool
 from utils.config import Config
+from utils.instrumentation import add_stage_time
+
+logger = logging.getLogger(__name__)
 
 # Create database connection string
-DB_URI = f"mysql+pymysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@{Config.MYSQL_HOST}/{Config.MYSQL_DB}"
+DB_URI = Config.DATABASE_URL or f"mysql+pymysql://{Config.MYSQL_USER}:{Config.MYSQL_PASSWORD}@{Config.MYSQL_HOST}/{Config.MYSQL_DB}"
+
+
+class PoolMetrics:
+    """Checkout wait times and connection usage of the engine's pool"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.peak_in_use = 0
+
+    def record(self, wait, in_use, timed_out=False):
+        with self.lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.peak_in_use = max(self.peak_in_use, in_use)
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def snapshot(self, pool):
+        with self.lock:
+            waits = self.checkouts + self.timeouts
+            return {
+                "pool_size": Config.DB_POOL_SIZE,
+                "max_overflow": Config.DB_MAX_OVERFLOW,
+                "in_use": pool.checkedout(),
+                "idle": pool.checkedin(),
+                "peak_in_use": self.peak_in_use,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": self.wait_total / waits * 1000 if waits else 0.0,
+                "wait_max_ms": self.wait_max * 1000,
+            }
+
+
+pool_metrics = PoolMetrics()
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection"""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeoutError:
+            pool_metrics.record(time.perf_counter() - start, self.checkedout(), timed_out=True)
+            raise
+        pool_metrics.record(time.perf_counter() - start, self.checkedout())
+        return connection
+
 
 # Create engine
-engine = create_engine(DB_URI)
+engine = create_engine(
+    DB_URI,
+    poolclass=MeteredQueuePool,
+    pool_size=Config.DB_POOL_SIZE,
+    max_overflow=Config.DB_MAX_OVERFLOW,
+    pool_timeout=Config.DB_POOL_TIMEOUT,
+    pool_recycle=Config.DB_POOL_RECYCLE,
+    pool_pre_ping=Config.DB_POOL_PRE_PING,
+)
+
+
+
+def normalize_statement(statement):
+    """Statement text with literals replaced by ? so repeated queries group together"""
+    statement = re.sub(r"'(?:[^']|'')*'", '?', statement)
+    statement = re.sub(r'\b\d+(?:\.\d+)?\b', '?', statement)
+    statement = re.sub(r'%\(\w+\)s|%s|:\w+', '?', statement)
+    statement = re.sub(r'\(\s*\?(?:\s*,\s*\?)+\s*\)', '(?, ...)', statement)
+    return ' '.join(statement.split())
+
+
+class RequestQueries:
+    """Statements run while handling one request (summary sections add theirs from worker threads)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.count = 0
+        self.seconds = 0.0
+        self.statements = {}  # normalized text -> [count, seconds, rows]
+
+    def record(self, normalized, seconds, rows):
+        with self.lock:
+            self.count += 1
+            self.seconds += seconds
+            entry = self.statements.setdefault(normalized, [0, 0.0, 0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] += rows or 0
+
+
+class QueryStats:
+    """Per-endpoint query counts and per-statement totals since the process started"""
+
+    def __init__(self, max_statements=500):
+        self.lock = threading.Lock()
+        self.max_statements = max_statements
+        self.endpoints = {}
+        self.statements = {}
+
+    def add_request(self, endpoint, queries, over_budget):
+        with self.lock:
+            entry = self.endpoints.setdefault(endpoint, {"requests": 0, "queries": 0, "max_queries": 0,
+                                                         "seconds": 0.0, "over_budget": 0})
+            entry["requests"] += 1
+            entry["queries"] += queries.count
+            entry["max_queries"] = max(entry["max_queries"], queries.count)
+            entry["seconds"] += queries.seconds
+            entry["over_budget"] += int(over_budget)
+            for normalized, (count, seconds, rows) in queries.statements.items():
+                if normalized not in self.statements and len(self.statements) >= self.max_statements:
+                    continue
+                total = self.statements.setdefault(normalized, {"count": 0, "seconds": 0.0, "max_seconds": 0.0,
+                                                                "rows": 0})
+                total["count"] += count
+                total["seconds"] += seconds
+                total["max_seconds"] = max(total["max_seconds"], seconds / count)
+                total["rows"] += rows
+
+    def snapshot(self, top=20):
+        with self.lock:
+            statements = sorted(self.statements.items(), key=lambda item: item[1]["seconds"], reverse=True)
+            return {
+                "budget": Config.QUERY_BUDGET,
+                "slow_query_seconds": Config.SLOW_QUERY_SECONDS,
+                "endpoints": {name: dict(entry) for name, entry in self.endpoints.items()},
+                "statements": [dict(entry, statement=normalized) for normalized, entry in statements[:top]],
+            }
+
+
+query_stats = QueryStats()
+
+# Queries of the request being handled
+_request_queries = contextvars.ContextVar('request_queries', default=None)
+
+# Slow statements are explained off the request path, each normalized statement once
+_explain_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='explain')
+_explained = set()
+_explained_lock = threading.Lock()
+slow_query_log = logging.getLogger('slow_queries')
+
+
+def _slow_query_handler():
+    if not slow_query_log.handlers:
+        os.makedirs(os.path.dirname(Config.SLOW_QUERY_LOG) or '.', exist_ok=True)
+        handler = logging.FileHandler(Config.SLOW_QUERY_LOG)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        slow_query_log.addHandler(handler)
+        slow_query_log.setLevel(logging.INFO)
+
+
+def explain_statement(statement, parameters):
+    """Log the plan of a slow SELECT (EXPLAIN, or EXPLAIN QUERY PLAN on SQLite) to the slow-query log"""
+    prefix = 'EXPLAIN QUERY PLAN' if engine.dialect.name == 'sqlite' else 'EXPLAIN'
+    try:
+        with engine.connect() as conn:
+            result = conn.exec_driver_sql(f"{prefix} {statement}", parameters)
+            plan = [dict(row._mapping) for row in result]
+    except Exception as e:
+        plan = f"EXPLAIN failed: {e}"
+    slow_query_log.info(f"{statement}\n  plan: {plan}")
+
+
+def _capture_slow(statement, parameters, normalized, seconds):
+    _slow_query_handler()
+    slow_query_log.warning(f"Slow query ({seconds * 1000:.0f}ms): {normalized}")
+    if not re.match(r'\s*(SELECT|WITH)\b', statement, re.IGNORECASE):
+        return
+    with _explained_lock:
+        if normalized in _explained:
+            return
+        _explained.add(normalized)
+    _explain_executor.submit(explain_statement, statement, parameters)
+
+
+@event.listens_for(engine, 'before_cursor_execute')
+def _start_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_starts', []).append(time.perf_counter())
+
+
+@event.listens_for(engine, 'after_cursor_execute')
+def _finish_statement(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_starts'].pop()
+    add_stage_time('sql', seconds)
+    normalized = normalize_statement(statement)
+    queries = _request_queries.get()
+    if queries is not None:
+        queries.record(normalized, seconds, cursor.rowcount if cursor.rowcount >= 0 else None)
+    if seconds >= Config.SLOW_QUERY_SECONDS and not executemany:
+        _capture_slow(statement, parameters, normalized, seconds)
+
+
+def start_request_queries():
+    """before_request handler: start counting the request's statements"""
+    _request_queries.set(RequestQueries())
+
+
+def finish_request_queries(response):
+    """after_request handler: report the request's statements and flag endpoints over QUERY_BUDGET"""
+    queries = _request_queries.get()
+    if queries is None:
+        return response
+    _request_queries.set(None)
+    endpoint = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+    over_budget = queries.count > Config.QUERY_BUDGET
+    if over_budget:
+        top = sorted(queries.statements.items(), key=lambda item: item[1][0], reverse=True)[:3]
+        logger.warning(f"{request.method} {endpoint} ran {queries.count} queries (budget {Config.QUERY_BUDGET}); "
+                       f"most repeated: {[(count, normalized) for normalized, (count, _, _) in top]}")
+    query_stats.add_request(endpoint, queries, over_budget)
+    response.headers['X-Query-Count'] = str(queries.count)
+    response.headers['X-Query-Time'] = f"{queries.seconds * 1000:.1f}"
+    return response
+
 
 # Create session factory
 session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,4 +252,33 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+
+def request_db():
+    """Session of the current Flask request; close_request_db releases it at teardown"""
+    if 'db' not in g:
+        g.db = SessionLocal()
+    return g.db
+
+
+def close_request_db(exc=None):
+    """Teardown handler: return the request's connection to the pool, even after an error"""
+    db = g.pop('db', None)
+    if db is not None:
+        db.close()
+    SessionLocal.remove()
+
+
+def pool_status():
+    return pool_metrics.snapshot(engine.pool)
+
+
+def query_status():
+    return query_stats.snapshot()
+
+
+def dataset_exists(db, dataset_name):
+    """True if dataset_name is registered in the dataset table (see utils/init_db.py)"""
+    row = db.execute(text("SELECT 1 FROM dataset WHERE name = :name"), {"name": dataset_name}).first()
+    return row is not None
@@ -0,0 +1,167 @@
+import re
+import logging
+import numpy as np
+from scipy import stats
+from sqlalchemy import inspect, text
+from utils.config import Config
+from utils.array_store import matrix_version, read_matrix
+from utils.clinical_cache import get_clinical_frame
+from utils.multiple_testing import bh_adjust
+from utils.survival import ResultCache
+
+logger = logging.getLogger(__name__)
+
+TESTS = ('welch', 'mannwhitney')
+
+# Each group needs at least this many measured samples for a gene to be tested
+MIN_GROUP_SIZE = 2
+
+# Whole matrices by (dataset, profile, data version)
+_matrices = ResultCache(maxsize=Config.DIFFERENTIAL_CACHE_ENTRIES)
+
+
+def _matrix(dataset_name, profile):
+    key = (dataset_name, profile, matrix_version(dataset_name, profile))
+
+    def compute():
+        genes, samples, values = read_matrix(dataset_name, profile)
+        return genes, samples, np.asarray(values, dtype=np.float64)
+
+    return _matrices.get_or_compute(key, compute)
+
+
+def case_list_table(dataset_name, stable_id):
+    """Name the dataloader gives the cases table of a case list"""
+    return re.sub(r'[^\w]', '_', f"{dataset_name}_cases_{stable_id}")[:64].lower()
+
+
+def case_list_samples(db, dataset_name, stable_id):
+    """Sample ids of a case list; raises ValueError for an unknown list"""
+    table = case_list_table(dataset_name, stable_id)
+    # The name comes from the request: only query tables that exist
+    if table not in inspect(db.get_bind()).get_table_names():
+        raise ValueError(f"Unknown case list: {stable_id}")
+    return {row[0] for row in db.execute(text(f"SELECT case_id FROM {table}")).fetchall()}
+
+
+def attribute_samples(dataset_name, attribute, values):
+    """Sample ids whose clinical attribute equals one of values (case-insensitive)"""
+    clinical_data = get_clinical_frame(dataset_name)
+    if attribute not in clinical_data.columns:
+        raise ValueError(f"Unknown clinical attribute: {attribute}")
+    wanted = {str(value).lower() for value in values}
+    column = clinical_data[attribute]
+    matches = column.notna() & column.astype(str).str.lower().isin(wanted)
+    return set(clinical_data.index[matches])
+
+
+def resolve_group(db, dataset_name, spec):
+    """Sample ids of a group spec: {"caseList": stable_id} or {"attribute": column, "value"/"values": ...}"""
+    if not isinstance(spec, dict):
+        raise ValueError("A group must be an object")
+    if spec.get("caseList"):
+        return case_list_samples(db, dataset_name, spec["caseList"])
+    if spec.get("attribute"):
+        values = spec.get("values", [spec.get("value")])
+        return attribute_samples(dataset_name, spec["attribute"], values)
+    raise ValueError("A group needs a caseList or an attribute")
+
+
+def welch_test(a, b):
+    """Welch's t test for every row of a against the same row of b (NaN = not measured).
+
+    Returns (statistic, p-value, Cohen's d with the pooled SD).
+    """
+    n_a, n_b = (~np.isnan(a)).sum(axis=1), (~np.isnan(b)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_a, mean_b = np.nanmean(a, axis=1), np.nanmean(b, axis=1)
+        var_a, var_b = np.nanvar(a, axis=1, ddof=1), np.nanvar(b, axis=1, ddof=1)
+        se2_a, se2_b = var_a / n_a, var_b / n_b
+        t = (mean_a - mean_b) / np.sqrt(se2_a + se2_b)
+        df = (se2_a + se2_b) ** 2 / (se2_a ** 2 / (n_a - 1) + se2_b ** 2 / (n_b - 1))
+        p = 2 * stats.t.sf(np.abs(t), df)
+        pooled = np.sqrt(((n_a - 1) * var_a + (n_b - 1) * var_b) / (n_a + n_b - 2))
+        d = (mean_a - mean_b) / pooled
+    return t, p, d
+
+
+def mann_whitney_test(a, b):
+    """Mann-Whitney U test (two-sided, normal approximation) for every row of a against b.
+
+    Rows without missing values are tested in one vectorized call; rows with
+    missing values are tested one by one. Returns (U, p-value, rank-biserial r).
+    """
+    u = np.full(len(a), np.nan)
+    p = np.full(len(a), np.nan)
+    complete = ~(np.isnan(a).any(axis=1) | np.isnan(b).any(axis=1))
+    if complete.any():
+        result = stats.mannwhitneyu(a[complete], b[complete], axis=1, method='asymptotic')
+        u[complete], p[complete] = result.statistic, result.pvalue
+    for row in np.flatnonzero(~complete):
+        x, y = a[row][~np.isnan(a[row])], b[row][~np.isnan(b[row])]
+        if len(x) and len(y):
+            result = stats.mannwhitneyu(x, y, method='asymptotic')
+            u[row], p[row] = result.statistic, result.pvalue
+    n_a, n_b = (~np.isnan(a)).sum(axis=1), (~np.isnan(b)).sum(axis=1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = 2 * u / (n_a * n_b) - 1
+    return u, p, r
+
+
+def differential_analysis(dataset_name, profile, samples_a, samples_b=None, test='welch', top_k=100):
+    """Compare two sample groups on every gene of a profile in one pass.
+
+    samples_b None means every other profiled sample. Samples in both groups
+    are dropped from both. Returns the top_k genes by p-value with group means,
+    mean difference, effect size (Cohen's d for welch, rank-biserial r for
+    mannwhitney), p and BH q over all tested genes.
+    """
+    if test not in TESTS:
+        raise ValueError(f"test must be one of {', '.join(TESTS)}")
+    genes, samples, values = _matrix(dataset_name, profile)
+    if samples_b is None:
+        samples_b = set(samples) - set(samples_a)
+
+    overlap = set(samples_a) & set(samples_b)
+    columns = {sample: col for col, sample in enumerate(samples)}
+    cols_a = [columns[s] for s in samples if s in samples_a and s not in overlap]
+    cols_b = [columns[s] for s in samples if s in samples_b and s not in overlap]
+    if len(cols_a) < MIN_GROUP_SIZE or len(cols_b) < MIN_GROUP_SIZE:
+        raise ValueError(f"Each group needs at least {MIN_GROUP_SIZE} profiled samples "
+                         f"(got {len(cols_a)} and {len(cols_b)})")
+
+    a, b = values[:, cols_a], values[:, cols_b]
+    n_a, n_b = (~np.isnan(a)).sum(axis=1), (~np.isnan(b)).sum(axis=1)
+    with np.errstate(invalid='ignore'):
+        mean_a, mean_b = np.nanmean(a, axis=1), np.nanmean(b, axis=1)
+    statistic, p, effect = welch_test(a, b) if test == 'welch' else mann_whitney_test(a, b)
+
+    testable = (n_a >= MIN_GROUP_SIZE) & (n_b >= MIN_GROUP_SIZE)
+    p = np.where(testable, p, np.nan)
+    q = bh_adjust(p)
+
+    tested = np.flatnonzero(~np.isnan(p))
+    top = tested[np.lexsort((-np.abs(mean_a - mean_b)[tested], p[tested]))][:top_k]
+    return {
+        "profile": profile,
+        "test": test,
+        "groupA": len(cols_a),
+        "groupB": len(cols_b),
+        "overlap": len(overlap),
+        "tested": int(len(tested)),
+        "results": [
+            {
+                "gene": genes[row],
+                "nA": int(n_a[row]),
+                "nB": int(n_b[row]),
+                "meanA": float(mean_a[row]),
+                "meanB": float(mean_b[row]),
+                "meanDiff": float(mean_a[row] - mean_b[row]),
+                "effectSize": None if np.isnan(effect[row]) else float(effect[row]),
+                "statistic": float(statistic[row]),
+                "pValue": float(p[row]),
+                "qValue": float(q[row]),
+            }
+            for row in top
+        ],
+    }
@@ -0,0 +1,105 @@
+import logging
+import numpy as np
+import pandas as pd
+from utils import array_store
+from utils.clinical_cache import get_clinical_frame
+from utils.correlation import correlation_p_values
+
+logger = logging.getLogger(__name__)
+
+# Clinical column behind each feature offered by the analysis page
+FEATURE_COLUMNS = {
+    'Age': 'AGE',
+    'Gender': 'SEX',
+    'Race': 'RACE',
+    'Tumor Histology': 'TUMOR_STATUS',
+    'Cancer State': 'AJCC_PATHOLOGIC_TUMOR_STAGE',
+}
+
+AGE_BINS = [0, 40, 50, 60, 70, 100]
+AGE_LABELS = ['<40', '40-50', '50-60', '60-70', '>70']
+
+BOX_STATS = {'min': 'min', 'Q1': '25%', 'median': '50%', 'Q3': '75%', 'max': 'max'}
+
+
+def gene_clinical_frame(dataset_name, profile, genes, columns):
+    """Long frame (Hugo_Symbol, SAMPLE_ID, value, *columns) for many genes, read once.
+
+    Every row of a repeated symbol is kept, as the single-gene analysis does.
+    """
+    clinical_data = get_clinical_frame(dataset_name)
+    rows = array_store.read_gene_rows(dataset_name, profile, genes)
+    rows = rows.loc[:, rows.columns.isin(clinical_data.index)]
+    long = rows.reset_index().melt(id_vars=['Hugo_Symbol'], var_name='SAMPLE_ID', value_name='value')
+    columns = [col for col in columns if col in clinical_data.columns]
+    clinical_rows = clinical_data.loc[long['SAMPLE_ID'], columns].reset_index(drop=True)
+    return pd.concat([long, clinical_rows], axis=1)
+
+
+def _describe_by(frame, column):
+    """{gene: {stat: {group: value}}}, the shape of groupby(...).describe().to_dict() per gene"""
+    described = frame.dropna(subset=[column]).groupby(['Hugo_Symbol', column], observed=False)['value'] \
+        .describe(percentiles=[.25, .5, .75])
+    result = {}
+    for gene, stats_frame in described.groupby(level=0):
+        result[gene] = stats_frame.droplevel(0).to_dict()
+    return result
+
+
+def _age_analysis(frame):
+    """{gene: {correlation, p_value, plots}}: Pearson r with age and age-group box plots"""
+    frame = frame.assign(AGE=pd.to_numeric(frame['AGE'], errors='coerce')).dropna(subset=['AGE'])
+
+    # Pearson r per gene from grouped sums over the samples with a value
+    paired = frame.dropna(subset=['value'])
+    sums = paired.assign(xx=paired['AGE'] ** 2, yy=paired['value'] ** 2, xy=paired['AGE'] * paired['value']) \
+        .groupby('Hugo_Symbol')[['AGE', 'value', 'xx', 'yy', 'xy']].sum()
+    n = paired.groupby('Hugo_Symbol').size().reindex(sums.index).to_numpy(dtype=np.float64)
+    sx, sy = sums['AGE'].to_numpy(), sums['value'].to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r = (n * sums['xy'].to_numpy() - sx * sy) / np.sqrt(
+            (n * sums['xx'].to_numpy() - sx ** 2) * (n * sums['yy'].to_numpy() - sy ** 2))
+    r = np.clip(r, -1, 1)
+    p = correlation_p_values(r, n)
+
+    frame = frame.assign(age_group=pd.cut(frame['AGE'], bins=AGE_BINS, labels=AGE_LABELS))
+    described = frame.groupby(['Hugo_Symbol', 'age_group'], observed=False)['value'] \
+        .describe(percentiles=[.25, .5, .75])
+
+    result = {}
+    for i, gene in enumerate(sums.index):
+        result[gene] = {'correlation': float(r[i]), 'p_value': float(p[i]), 'plots': {}}
+    for (gene, group), row in described.iterrows():
+        entry = result.setdefault(gene, {'correlation': None, 'p_value': None, 'plots': {}})
+        entry['plots'][group] = {name: row[stat] for name, stat in BOX_STATS.items()}
+    return result
+
+
+def batch_feature_stats(dataset_name, profile, genes, features):
+    """Every gene x clinical feature analysis of the analysis page from one load.
+
+    features maps each feature name to its clinical column. Per gene the result
+    has the same 'analyses' entries as single-gene requests; genes missing from
+    the profile are listed under 'missing'.
+    """
+    frame = gene_clinical_frame(dataset_name, profile, genes, list(features.values()))
+    found = set(frame['Hugo_Symbol'])
+    counts = frame.groupby('Hugo_Symbol').size()
+
+    results = {gene: {'gene_name': gene, 'sample_count': int(counts[gene]), 'analyses': {}}
+               for gene in genes if gene in found}
+    for feature, column in features.items():
+        if column not in frame.columns:
+            continue
+        per_gene = _age_analysis(frame) if feature == 'Age' else \
+            {gene: {'stats': stats} for gene, stats in _describe_by(frame, column).items()}
+        for gene, analysis in per_gene.items():
+            results[gene]['analyses'][feature] = analysis
+
+    logger.info(f"Batch analysis of {len(results)} genes x {len(features)} features on {profile} of {dataset_name}")
+    return {
+        'profile': profile,
+        'features': list(features),
+        'genes': results,
+        'missing': [gene for gene in genes if gene not in found],
+    }
@@ -0,0 +1,106 @@
+import os
+import glob
+import hashlib
+import logging
+import numpy as np
+from scipy.cluster.hierarchy import linkage, leaves_list
+from scipy.spatial.distance import pdist
+from utils.config import Config
+from utils.survival import ResultCache
+
+logger = logging.getLogger(__name__)
+
+METRICS = ('euclidean', 'correlation', 'cosine', 'cityblock')
+METHODS = ('average', 'complete', 'single', 'ward')
+CLUSTER_AXES = {'rows': (True, False), 'cols': (False, True), 'both': (True, True)}
+
+# Keys include the user-chosen gene list, so both caches are bounded
+_memory = ResultCache(maxsize=Config.CLUSTER_CACHE_ENTRIES)
+
+
+def _cache_key(dataset_name, profile, labels, values, metric, method):
+    """Key on the exact gene/sample set and its values, so new data never reuses an old order"""
+    digest = hashlib.sha1()
+    for part in (dataset_name, profile, metric, method):
+        digest.update(str(part).encode('utf-8'))
+        digest.update(b'\0')
+    digest.update('\n'.join(map(str, labels)).encode('utf-8'))
+    digest.update(np.ascontiguousarray(values, dtype=np.float32).tobytes())
+    return digest.hexdigest()
+
+
+def _cache_path(key):
+    return os.path.join(Config.CLUSTER_CACHE_DIR, f"{key}.npz")
+
+
+def _prune_disk_cache():
+    """Drop the least recently used .npz files beyond CLUSTER_CACHE_MAX_FILES"""
+    paths = glob.glob(os.path.join(Config.CLUSTER_CACHE_DIR, '*.npz'))
+    if len(paths) <= Config.CLUSTER_CACHE_MAX_FILES:
+        return
+    paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+    for path in paths[:len(paths) - Config.CLUSTER_CACHE_MAX_FILES]:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def dendrogram(values, labels, dataset_name, profile, metric='euclidean', method='average'):
+    """Leaf order and linkage matrix for the rows of values, computed once and persisted.
+
+    Returns (order, linkage_matrix). Missing values are treated as 0, as in the heatmap.
+    """
+    if method == 'ward' and metric != 'euclidean':
+        raise ValueError("ward linkage requires the euclidean metric")
+
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    key = _cache_key(dataset_name, profile, labels, values, metric, method)
+
+    def compute():
+        path = _cache_path(key)
+        if os.path.exists(path):
+            with np.load(path) as stored:
+                result = (stored['order'], stored['linkage'])
+            # Mark as recently used for _prune_disk_cache
+            os.utime(path)
+            return result
+
+        if len(values) < 2:
+            result = (np.arange(len(values)), np.empty((0, 4)))
+        else:
+            distances = pdist(values, metric=metric)
+            # Constant rows have no correlation/cosine distance; treat them as farthest apart
+            finite = distances[np.isfinite(distances)]
+            distances = np.nan_to_num(distances, nan=finite.max() if finite.size else 1.0)
+            matrix = linkage(distances, method=method)
+            result = (leaves_list(matrix), matrix)
+        os.makedirs(Config.CLUSTER_CACHE_DIR, exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, order=result[0], linkage=result[1])
+        os.replace(tmp_path, path)
+        _prune_disk_cache()
+        logger.info(f"Clustered {len(values)} {profile} rows ({metric}/{method})")
+        return result
+
+    return _memory.get_or_compute(key, compute)
+
+
+def cluster_frame(df, cluster, dataset_name, profile, metric='euclidean', method='average'):
+    """Reorder a gene x sample frame by hierarchical clustering of rows, columns or both.
+
+    Returns (reordered frame, {'rows': linkage, 'cols': linkage}).
+    """
+    if cluster not in CLUSTER_AXES:
+        raise ValueError(f"cluster must be one of {', '.join(CLUSTER_AXES)}")
+    if metric not in METRICS or method not in METHODS:
+        raise ValueError("unsupported metric or linkage method")
+
+    cluster_rows, cluster_cols = CLUSTER_AXES[cluster]
+    row_order, col_order = np.arange(df.shape[0]), np.arange(df.shape[1])
+    linkages = {}
+    if cluster_rows:
+        row_order, linkages['rows'] = dendrogram(df.values, df.index, dataset_name, profile, metric, method)
+    if cluster_cols:
+        col_order, linkages['cols'] = dendrogram(df.values.T, df.columns, dataset_name, profile, metric, method)
+    return df.iloc[row_order, col_order], linkages
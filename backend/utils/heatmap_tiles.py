@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+import threading
+import warnings
+import numpy as np
+from utils import columnar
+
+logger = logging.getLogger(__name__)
+
+TILE_SIZE = 256
+POOLING = ('mean', 'max')
+DEFAULT_PROFILE = 'data_mrna_seq_v2_rsem_zscores_ref_all_samples'
+
+# Rows of the previous level pooled per step; bounds memory while building
+_BUILD_ROWS = 2048
+
+# Pyramids can be built on the request path; one build at a time
+_build_lock = threading.Lock()
+
+
+def pyramid_dir(file_path, pooling):
+    return os.path.join(columnar.mirror_dir(file_path), f"pyramid_{pooling}")
+
+
+def _pool(block, pooling):
+    """2x2 pooling of a block with an even number of rows and columns, ignoring NaN"""
+    rows, cols = block.shape
+    quads = block.reshape(rows // 2, 2, cols // 2, 2)
+    with warnings.catch_warnings():
+        # All-NaN windows legitimately pool to NaN
+        warnings.simplefilter('ignore', category=RuntimeWarning)
+        if pooling == 'max':
+            return np.nanmax(quads, axis=(1, 3))
+        return np.nanmean(quads, axis=(1, 3))
+
+
+def _build_level(source, target_path, pooling):
+    rows, cols = source.shape
+    out_rows, out_cols = (rows + 1) // 2, (cols + 1) // 2
+    # Fill a temp file and rename it, so readers of the current level never see it truncated
+    tmp_path = columnar._tmp_path(target_path)
+    target = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(out_rows, out_cols))
+
+    for start in range(0, rows, _BUILD_ROWS):
+        block = np.asarray(source[start:start + _BUILD_ROWS], dtype=np.float32)
+        # Pad odd edges with NaN so every window is 2x2
+        pad_rows, pad_cols = block.shape[0] % 2, cols % 2
+        if pad_rows or pad_cols:
+            block = np.pad(block, ((0, pad_rows), (0, pad_cols)), constant_values=np.nan)
+        target[start // 2:start // 2 + block.shape[0] // 2] = _pool(block, pooling)
+
+    target.flush()
+    os.replace(tmp_path, target_path)
+    return target
+
+
+def build_pyramid(file_path, pooling='mean'):
+    """Build the zoom levels of a matrix file: level 0 is full resolution, each level halves both axes"""
+    mirror = columnar.ensure_mirror(file_path)
+    directory = pyramid_dir(file_path, pooling)
+    os.makedirs(directory, exist_ok=True)
+
+    level = np.load(os.path.join(mirror, 'values.npy'), mmap_mode='r')
+    shapes = [list(level.shape)]
+    while level.shape[0] > TILE_SIZE or level.shape[1] > TILE_SIZE:
+        level = _build_level(level, os.path.join(directory, f"level_{len(shapes)}.npy"), pooling)
+        shapes.append(list(level.shape))
+
+    with open(os.path.join(mirror, 'manifest.json')) as f:
+        source_sha1 = json.load(f)['sha1']
+    columnar._write_json(os.path.join(directory, 'pyramid.json'),
+                         {'source_sha1': source_sha1, 'tile_size': TILE_SIZE, 'shapes': shapes})
+    logger.info(f"Built {pooling} heatmap pyramid for {file_path}: {len(shapes)} levels")
+
+
+def _current_pyramid(file_path, pooling):
+    """The pyramid description if it matches the current mirror, else None"""
+    mirror = columnar.ensure_mirror(file_path)
+    with open(os.path.join(mirror, 'manifest.json')) as f:
+        source_sha1 = json.load(f)['sha1']
+    try:
+        with open(os.path.join(pyramid_dir(file_path, pooling), 'pyramid.json')) as f:
+            info = json.load(f)
+        if info['source_sha1'] == source_sha1 and info['tile_size'] == TILE_SIZE:
+            return info
+    except (OSError, ValueError, KeyError):
+        pass
+    return None
+
+
+def ensure_pyramid(file_path, pooling='mean'):
+    """Return the pyramid description, building it if missing or out of date"""
+    info = _current_pyramid(file_path, pooling)
+    if info is not None:
+        return info
+    with _build_lock:
+        # Another request may have built it while we waited
+        info = _current_pyramid(file_path, pooling)
+        if info is None:
+            build_pyramid(file_path, pooling)
+            info = _current_pyramid(file_path, pooling)
+    return info
+
+
+def _level_path(file_path, level, pooling):
+    if level == 0:
+        return os.path.join(columnar.mirror_dir(file_path), 'values.npy')
+    return os.path.join(pyramid_dir(file_path, pooling), f"level_{level}.npy")
+
+
+def read_tile(file_path, level, row, col, pooling='mean'):
+    """Return (tile, info) for tile (row, col) of a zoom level; edge tiles may be smaller"""
+    info = ensure_pyramid(file_path, pooling)
+    if not 0 <= level < len(info['shapes']):
+        raise ValueError(f"level must be between 0 and {len(info['shapes']) - 1}")
+
+    rows, cols = info['shapes'][level]
+    if not (0 <= row * TILE_SIZE < rows and 0 <= col * TILE_SIZE < cols):
+        raise ValueError("tile out of range")
+
+    values = np.load(_level_path(file_path, level, pooling), mmap_mode='r')
+    tile = np.asarray(values[row * TILE_SIZE:(row + 1) * TILE_SIZE, col * TILE_SIZE:(col + 1) * TILE_SIZE])
+    return tile, info
+
+
+def build_pyramids(dataset_path, pooling='mean'):
+    """Build heatmap pyramids for the expression matrices of a dataset directory"""
+    for file_name in sorted(os.listdir(dataset_path)):
+        if file_name.startswith('data_mrna') and file_name.endswith('.csv'):
+            try:
+                ensure_pyramid(os.path.join(dataset_path, file_name), pooling)
+            except Exception as e:
+                logger.error(f"Error building heatmap pyramid for {file_name}: {e}")
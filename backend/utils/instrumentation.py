@@ -0,0 +1,165 @@
+import time
+import threading
+import contextvars
+from contextlib import ContextDecorator
+from flask import g, request
+from flask_restful.representations.json import output_json
+
+# Stage names used across the routes; any other name works too
+STAGES = ('sql', 'csv_parse', 'array_read', 'merge', 'stats', 'km_fit', 'serialize')
+
+# Prometheus' default latency buckets, in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class StageTimings:
+    """Seconds spent per stage during one request (stages may repeat and run in threads)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.seconds = {}
+
+    def add(self, name, seconds):
+        with self.lock:
+            self.seconds[name] = self.seconds.get(name, 0.0) + seconds
+
+    def items(self):
+        with self.lock:
+            return list(self.seconds.items())
+
+
+# Timings of the request being handled; worker threads see it through a copied context
+_current = contextvars.ContextVar('stage_timings', default=None)
+
+
+class stage(ContextDecorator):
+    """Time a named stage of the current request: `with stage('sql'):` or `@stage('stats')`.
+
+    Nothing is recorded outside a request.
+    """
+
+    def __init__(self, name):
+        self.name = name
+
+    def _recreate_cm(self):
+        # A fresh timer per decorated call, so concurrent calls do not share a start time
+        return stage(self.name)
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        timings = _current.get()
+        if timings is not None:
+            timings.add(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def add_stage_time(name, seconds):
+    """Add time measured elsewhere (e.g. by the engine's statement hooks) to a stage of the current request"""
+    timings = _current.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+
+def copy_context():
+    """Context to run a worker-thread task in so its stages count for the current request"""
+    return contextvars.copy_context()
+
+
+class Histogram:
+    """Cumulative Prometheus histogram with labels, kept in process memory"""
+
+    def __init__(self, name, help_text, label_names, buckets=BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self.lock = threading.Lock()
+        self.series = {}  # label values -> [bucket counts..., count, sum]
+
+    def observe(self, labels, value):
+        with self.lock:
+            series = self.series.setdefault(labels, [0] * len(self.buckets) + [0, 0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += value
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted(self.series.items())
+            for labels, values in series:
+                pairs = list(zip(self.label_names, labels))
+                for bound, count in zip(self.buckets, values):
+                    lines.append(f"{self.name}_bucket{_labels(pairs + [('le', bound)])} {count}")
+                lines.append(f"{self.name}_bucket{_labels(pairs + [('le', '+Inf')])} {values[-2]}")
+                lines.append(f"{self.name}_count{_labels(pairs)} {values[-2]}")
+                lines.append(f"{self.name}_sum{_labels(pairs)} {values[-1]}")
+        return lines
+
+
+def _labels(pairs):
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+request_latency = Histogram('http_request_duration_seconds', 'Request latency by endpoint.',
+                            ('endpoint', 'method', 'status'))
+stage_latency = Histogram('http_request_stage_duration_seconds', 'Time per request stage by endpoint.',
+                          ('endpoint', 'stage'))
+
+
+def render_metrics():
+    """All histograms in the Prometheus text format (this process only)"""
+    lines = request_latency.render() + stage_latency.render()
+    return '\n'.join(lines) + '\n'
+
+
+def timed_output_json(data, code, headers=None):
+    """flask_restful's JSON representation, timed as the serialize stage"""
+    with stage('serialize'):
+        return output_json(data, code, headers)
+
+
+def _endpoint():
+    # The URL rule, not the path, so dataset names do not multiply the series
+    return request.url_rule.rule if request.url_rule is not None else 'unmatched'
+
+
+def init_app(app, api=None):
+    """Time every request: Server-Timing header per response and histograms for /metrics"""
+
+    @app.before_request
+    def start_timing():
+        g.request_start = time.perf_counter()
+        _current.set(StageTimings())
+
+    @app.after_request
+    def finish_timing(response):
+        timings = _current.get()
+        if timings is None or 'request_start' not in g:
+            return response
+        total = time.perf_counter() - g.request_start
+        endpoint = _endpoint()
+        stages = timings.items()
+
+        request_latency.observe((endpoint, request.method, str(response.status_code)), total)
+        for name, seconds in stages:
+            stage_latency.observe((endpoint, name), seconds)
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in stages]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        response.headers['Server-Timing'] = ', '.join(entries)
+        return response
+
+    @app.teardown_request
+    def stop_timing(exc=None):
+        _current.set(None)
+
+    if api is not None:
+        api.representations['application/json'] = timed_output_json
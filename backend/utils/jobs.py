@@ -0,0 +1,337 @@
+import os
+import json
+import glob
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from utils.config import Config
+from utils import columnar, database
+from utils.array_store import matrix_version
+from utils.clinical_cache import source_signature
+from utils.correlation import METHODS, top_correlated
+from utils.differential import TESTS, differential_analysis, resolve_group
+from utils.feature_stats import FEATURE_COLUMNS, batch_feature_stats
+
+logger = logging.getLogger(__name__)
+
+# Genes per step of a batch job; progress is reported after each step
+BATCH_CHUNK = 50
+
+
+class JobCancelled(Exception):
+    pass
+
+
+# Job kinds and their parameters with defaults; other request keys are ignored,
+# so they never change the content key
+JOB_PARAMS = {
+    'batch': {'profile': None, 'genes': None, 'features': list(FEATURE_COLUMNS)},
+    'correlation': {'profile': None, 'genes': None, 'method': 'pearson', 'topK': 20},
+    'differential': {'profile': None, 'groupA': None, 'groupB': None, 'test': 'welch', 'topK': 100},
+}
+
+
+def canonical_params(kind, params):
+    """The job's parameters with defaults filled in and lists normalized; raises ValueError"""
+    if kind not in JOB_PARAMS:
+        raise ValueError(f"kind must be one of {', '.join(JOB_PARAMS)}")
+    canonical = {name: params.get(name, default) for name, default in JOB_PARAMS[kind].items()}
+
+    if 'genes' in canonical:
+        genes = canonical['genes']
+        if not isinstance(genes, list) or not genes:
+            raise ValueError("genes must be a non-empty list")
+        canonical['genes'] = sorted({str(gene).upper() for gene in genes})
+    if 'features' in canonical:
+        features = canonical['features']
+        if not isinstance(features, list) or any(feature not in FEATURE_COLUMNS for feature in features):
+            raise ValueError(f"features must be a list of {', '.join(FEATURE_COLUMNS)}")
+        canonical['features'] = [feature for feature in FEATURE_COLUMNS if feature in features]
+    if 'topK' in canonical:
+        canonical['topK'] = int(canonical['topK'])
+        if canonical['topK'] < 1:
+            raise ValueError("topK must be at least 1")
+    if canonical.get('method', 'pearson') not in METHODS:
+        raise ValueError(f"method must be one of {', '.join(METHODS)}")
+    if canonical.get('test', 'welch') not in TESTS:
+        raise ValueError(f"test must be one of {', '.join(TESTS)}")
+    if kind == 'differential' and not canonical['groupA']:
+        raise ValueError("groupA is required")
+    return canonical
+
+
+def dataset_version(dataset_name, profile):
+    """Versions of the clinical files and the profile matrix a job reads"""
+    return [source_signature(dataset_name), matrix_version(dataset_name, profile)]
+
+
+def job_key(kind, dataset_name, params, version):
+    """Content address of a job: equal requests on unchanged data share it"""
+    document = {'kind': kind, 'dataset': dataset_name, 'params': params, 'version': version}
+    return hashlib.sha256(json.dumps(document, sort_keys=True, default=list).encode('utf-8')).hexdigest()
+
+
+def _path(job_id, suffix):
+    return os.path.join(Config.JOBS_DIR, f"{job_id}.{suffix}")
+
+
+def read_result(job_id):
+    """The stored result document of a finished job, or None"""
+    try:
+        with open(_path(job_id, 'result.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _read_progress(job_id):
+    try:
+        with open(_path(job_id, 'progress.json')) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _prune_results():
+    """Drop the oldest results beyond JOB_RESULTS_MAX_FILES"""
+    paths = glob.glob(os.path.join(Config.JOBS_DIR, '*.result.json'))
+    if len(paths) <= Config.JOB_RESULTS_MAX_FILES:
+        return
+    paths.sort(key=lambda path: os.path.getmtime(path) if os.path.exists(path) else 0)
+    for path in paths[:len(paths) - Config.JOB_RESULTS_MAX_FILES]:
+        _remove(path)
+
+
+# Runners: executed in the worker processes, report progress(done, total) as they go
+
+def _run_batch(dataset_name, params, progress):
+    genes = params['genes']
+    features = {feature: FEATURE_COLUMNS[feature] for feature in params['features']}
+    result = None
+    for start in range(0, len(genes), BATCH_CHUNK):
+        part = batch_feature_stats(dataset_name, params['profile'], genes[start:start + BATCH_CHUNK], features)
+        if result is None:
+            result = part
+        else:
+            result['genes'].update(part['genes'])
+            result['missing'].extend(part['missing'])
+        progress(min(start + BATCH_CHUNK, len(genes)), len(genes))
+    return result
+
+
+def _run_correlation(dataset_name, params, progress):
+    genes = params['genes']
+    result = {'profile': params['profile'], 'method': params['method'], 'genes': {}, 'missing': []}
+    for done, gene in enumerate(genes, 1):
+        try:
+            result['genes'][gene] = top_correlated(dataset_name, params['profile'], gene,
+                                                   params['method'], params['topK'])
+        except KeyError:
+            result['missing'].append(gene)
+        progress(done, len(genes))
+    return result
+
+
+def _run_differential(dataset_name, params, progress):
+    db = next(database.get_db())
+    try:
+        groups = []
+        for spec in (params['groupA'], params['groupB']):
+            if spec is None:
+                groups.append(None)
+                continue
+            if isinstance(spec, dict) and spec.get('attribute'):
+                spec = dict(spec, attribute=FEATURE_COLUMNS.get(spec['attribute'], spec['attribute']))
+            groups.append(resolve_group(db, dataset_name, spec))
+    finally:
+        db.close()
+    progress(1, 2)
+    result = differential_analysis(dataset_name, params['profile'], groups[0], groups[1],
+                                   params['test'], params['topK'])
+    progress(2, 2)
+    return result
+
+
+RUNNERS = {
+    'batch': _run_batch,
+    'correlation': _run_correlation,
+    'differential': _run_differential,
+}
+
+
+def _init_worker():
+    # Pooled connections inherited from the web process must not be shared with it
+    database.engine.dispose(close=False)
+
+
+def _execute(job_id, kind, dataset_name, params):
+    """Run one job in a worker process and store its result under the job id"""
+    def progress(done, total):
+        if os.path.exists(_path(job_id, 'cancel')):
+            raise JobCancelled()
+        columnar._write_json(_path(job_id, 'progress.json'), {'done': done, 'total': total})
+
+    start = time.perf_counter()
+    progress(0, None)
+    result = RUNNERS[kind](dataset_name, params, progress)
+    columnar._write_json(_path(job_id, 'result.json'), {
+        'id': job_id,
+        'kind': kind,
+        'dataset': dataset_name,
+        'params': params,
+        'finished': time.time(),
+        'seconds': time.perf_counter() - start,
+        'result': result,
+    })
+    _prune_results()
+    logger.info(f"Job {job_id[:12]} ({kind} on {dataset_name}) finished in {time.perf_counter() - start:.2f}s")
+
+
+class Job:
+    """A submitted job, as seen from the web process"""
+
+    def __init__(self, job_id, kind, dataset_name, params, future):
+        self.id = job_id
+        self.kind = kind
+        self.dataset = dataset_name
+        self.params = params
+        self.future = future
+        self.submitted = time.time()
+        self.finished = None
+        self.cancel_requested = False
+
+    def status(self):
+        if self.future.cancelled():
+            return 'cancelled'
+        if not self.future.done():
+            if self.cancel_requested:
+                return 'cancelling'
+            return 'running' if self.future.running() else 'queued'
+        error = self.future.exception()
+        if isinstance(error, JobCancelled):
+            return 'cancelled'
+        return 'failed' if error is not None else 'completed'
+
+    def describe(self):
+        status = self.status()
+        document = {'id': self.id, 'kind': self.kind, 'dataset': self.dataset, 'status': status,
+                    'submitted': self.submitted, 'finished': self.finished,
+                    'progress': _read_progress(self.id)}
+        if status == 'failed':
+            document['error'] = str(self.future.exception())
+        elif status == 'completed':
+            stored = read_result(self.id)
+            if stored is None:
+                # Pruned since; resubmitting recomputes it
+                document['status'] = 'expired'
+            else:
+                document['result'] = stored['result']
+        return document
+
+
+_jobs = {}
+_jobs_lock = threading.Lock()
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=Config.JOB_WORKERS, initializer=_init_worker)
+    return _executor
+
+
+def _finished(job):
+    def callback(future):
+        job.finished = time.time()
+        _remove(_path(job.id, 'cancel'))
+        _remove(_path(job.id, 'progress.json'))
+    return callback
+
+
+def _forget_old_jobs(now):
+    for job_id, job in list(_jobs.items()):
+        if job.future.done() and job.finished and now - job.finished > Config.JOB_RETENTION:
+            del _jobs[job_id]
+
+
+def stored_job(job_id, document):
+    return {'id': job_id, 'kind': document['kind'], 'dataset': document['dataset'], 'status': 'completed',
+            'submitted': None, 'finished': document['finished'], 'progress': None,
+            'result': document['result']}
+
+
+def submit(kind, dataset_name, params):
+    """Queue a job, or return the existing one for the same content key.
+
+    Returns the job document; a stored result is returned as a completed job
+    right away. Raises ValueError for invalid parameters.
+    """
+    params = canonical_params(kind, params)
+    try:
+        version = dataset_version(dataset_name, params['profile'])
+    except OSError:
+        raise ValueError(f"Dataset {dataset_name} has no {params['profile']} data")
+    job_id = job_key(kind, dataset_name, params, version)
+
+    stored = read_result(job_id)
+    if stored is not None:
+        return stored_job(job_id, stored)
+
+    global _executor
+    with _jobs_lock:
+        _forget_old_jobs(time.time())
+        job = _jobs.get(job_id)
+        if job is not None and job.status() in ('queued', 'running', 'completed'):
+            return job.describe()
+
+        os.makedirs(Config.JOBS_DIR, exist_ok=True)
+        _remove(_path(job_id, 'cancel'))
+        try:
+            future = _get_executor().submit(_execute, job_id, kind, dataset_name, params)
+        except BrokenProcessPool:
+            # A worker died (e.g. out of memory); start a fresh pool
+            logger.warning("Job worker pool is broken, restarting it")
+            _executor = None
+            future = _get_executor().submit(_execute, job_id, kind, dataset_name, params)
+        job = Job(job_id, kind, dataset_name, params, future)
+        _jobs[job_id] = job
+        future.add_done_callback(_finished(job))
+    logger.info(f"Queued job {job_id[:12]} ({kind} on {dataset_name})")
+    return job.describe()
+
+
+def get_job(job_id):
+    """Job document by id, or None; results stored by other processes are found too"""
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is not None:
+        return job.describe()
+    stored = read_result(job_id)
+    return stored_job(job_id, stored) if stored is not None else None
+
+
+def cancel_job(job_id):
+    """Cancel a queued job, or ask a running one to stop at its next progress step.
+
+    Returns the job document, or None for an unknown job.
+    """
+    with _jobs_lock:
+        job = _jobs.get(job_id)
+    if job is None:
+        return get_job(job_id)
+    if not job.future.cancel() and not job.future.done():
+        job.cancel_requested = True
+        with open(_path(job_id, 'cancel'), 'w'):
+            pass
+    return job.describe()
@@ -0,0 +1,91 @@
+import os
+import logging
+from datetime import datetime
+from sqlalchemy import inspect, MetaData, Table, Column, Integer, BigInteger, Float, String, Text, DateTime
+from utils.columnar import file_hash
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the loader stores files differently, so every file is reloaded once
+LOADER_VERSION = 3
+
+metadata = MetaData()
+
+# One row per source file: what was loaded, from which version of the file, into which tables
+load_manifest = Table(
+    'load_manifest', metadata,
+    Column('path', String(512), primary_key=True),
+    Column('dataset', String(255), nullable=False),
+    Column('size', BigInteger, nullable=False),
+    Column('mtime', Float, nullable=False),
+    Column('sha1', String(40), nullable=False),
+    Column('tables', Text),  # comma-separated; case lists create two tables
+    Column('row_count', Integer),
+    Column('status', String(16), nullable=False),  # loading | complete | failed
+    Column('loader_version', Integer, nullable=False),
+    Column('loaded_at', DateTime, nullable=False),
+)
+
+
+def ensure_manifest_table(bind):
+    inspector = inspect(bind)
+    if inspector.has_table(load_manifest.name):
+        columns = {column['name'] for column in inspector.get_columns(load_manifest.name)}
+        if columns != set(load_manifest.c.keys()):
+            # Older manifest layout; dropping it only costs one full reload
+            load_manifest.drop(bind)
+            logger.info("Dropped outdated load manifest")
+    metadata.create_all(bind, tables=[load_manifest], checkfirst=True)
+
+
+def manifest_key(file_path):
+    return os.path.normpath(file_path)
+
+
+def get_entry(conn, file_path):
+    return conn.execute(
+        load_manifest.select().where(load_manifest.c.path == manifest_key(file_path))
+    ).mappings().first()
+
+
+def check_file(conn, file_path):
+    """Return (unchanged, sha1) for file_path against its manifest entry.
+
+    Entries written by another LOADER_VERSION never match. A completed entry
+    with the same size and mtime is trusted without hashing;
+    otherwise the content hash decides, so a touched but identical file is not
+    reloaded.
+    """
+    entry = get_entry(conn, file_path)
+    stat = os.stat(file_path)
+    if (entry is not None and entry['status'] == 'complete' and entry['loader_version'] == LOADER_VERSION
+            and entry['size'] == stat.st_size):
+        if entry['mtime'] == stat.st_mtime:
+            return True, entry['sha1']
+        sha1 = file_hash(file_path)
+        if sha1 == entry['sha1']:
+            conn.execute(load_manifest.update()
+                         .where(load_manifest.c.path == entry['path'])
+                         .values(mtime=stat.st_mtime))
+            return True, sha1
+        return False, sha1
+    return False, file_hash(file_path)
+
+
+def record(conn, file_path, dataset_name, sha1, status, tables=(), row_count=None):
+    """Insert or replace the manifest entry of file_path (caller commits)"""
+    stat = os.stat(file_path)
+    key = manifest_key(file_path)
+    conn.execute(load_manifest.delete().where(load_manifest.c.path == key))
+    conn.execute(load_manifest.insert().values(
+        path=key,
+        dataset=dataset_name,
+        size=stat.st_size,
+        mtime=stat.st_mtime,
+        sha1=sha1,
+        tables=','.join(tables),
+        row_count=row_count,
+        status=status,
+        loader_version=LOADER_VERSION,
+        loaded_at=datetime.utcnow(),
+    ))
@@ -0,0 +1,12 @@
+import numpy as np
+from scipy import stats
+
+
+def bh_adjust(p_values):
+    """Benjamini-Hochberg adjusted p-values (q-values); NaN p-values are left out and stay NaN"""
+    p_values = np.asarray(p_values, dtype=float)
+    q_values = np.full(p_values.shape, np.nan)
+    tested = ~np.isnan(p_values)
+    if tested.any():
+        q_values[tested] = stats.false_discovery_control(p_values[tested], method='bh')
+    return q_values
@@ -0,0 +1,96 @@
+import io
+import os
+import csv
+import json
+import logging
+import threading
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+INDEX_SUFFIX = '.rowidx.json'
+
+_loaded = {}  # file path -> index, reused while the index file is unchanged
+_lock = threading.Lock()
+
+
+def index_path(file_path):
+    """The index lives next to the matrix file it describes"""
+    return file_path + INDEX_SUFFIX
+
+
+def _row_key(line):
+    """First field of a CSV line, parsed the way pandas reads it"""
+    if line.startswith(b'"'):
+        # Quoted symbols may contain commas or escaped quotes
+        return next(csv.reader([line.decode('utf-8')]))[0]
+    return line.split(b',', 1)[0].rstrip(b'\r\n').decode('utf-8')
+
+
+def build_index(file_path):
+    """Scan a gene x sample CSV once and record the byte offset and length of every row.
+
+    Rows are keyed by their first field (Hugo_Symbol); a symbol that appears on
+    several rows maps to all of them, in file order.
+    """
+    rows = {}
+    with open(file_path, 'rb') as f:
+        header = f.readline()
+        offset = len(header)
+        for line in f:
+            key = _row_key(line)
+            rows.setdefault(key, []).append([offset, len(line)])
+            offset += len(line)
+
+    stat = os.stat(file_path)
+    index = {
+        'mtime': stat.st_mtime,
+        'size': stat.st_size,
+        'header': header.decode('utf-8'),
+        'rows': rows,
+    }
+    # Unique per writer: concurrent requests may build the same index
+    tmp_path = f"{index_path(file_path)}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f)
+    os.replace(tmp_path, index_path(file_path))
+    logger.info(f"Indexed {sum(len(v) for v in rows.values())} rows of {file_path}")
+    return index
+
+
+def load_index(file_path):
+    """Return the row index of file_path, rebuilding it when the file's mtime or size changed"""
+    stat = os.stat(file_path)
+    with _lock:
+        index = _loaded.get(file_path)
+    if index is None or index['mtime'] != stat.st_mtime or index['size'] != stat.st_size:
+        try:
+            with open(index_path(file_path)) as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            index = None
+        if index is None or index['mtime'] != stat.st_mtime or index['size'] != stat.st_size:
+            index = build_index(file_path)
+        with _lock:
+            _loaded[file_path] = index
+    return index
+
+
+def read_rows(file_path, genes, id_columns=('Hugo_Symbol', 'Entrez_Gene_Id')):
+    """Seek to and parse only the rows of the given genes.
+
+    Returns a numeric DataFrame indexed by Hugo_Symbol with one column per sample.
+    """
+    index = load_index(file_path)
+    chunks = [index['header']]
+    with open(file_path, 'rb') as f:
+        for gene in genes:
+            for offset, length in index['rows'].get(gene, []):
+                f.seek(offset)
+                line = f.read(length).decode('utf-8')
+                chunks.append(line if line.endswith('\n') else line + '\n')
+
+    df = pd.read_csv(io.StringIO(''.join(chunks)), na_values=['Not Available'])
+    df = df.set_index('Hugo_Symbol')
+    df = df.drop(columns=[col for col in id_columns if col in df.columns])
+    return df.apply(pd.to_numeric, errors='coerce')
@@ -0,0 +1,404 @@
+import re
+import json
+import zlib
+import time
+import logging
+import threading
+from datetime import datetime
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+from sqlalchemy import MetaData, Table, Column, Integer, String, DateTime, LargeBinary, text, inspect
+from sqlalchemy.dialects.mysql import LONGBLOB
+from utils.config import Config
+from utils.instrumentation import copy_context
+from utils.aggregation import (
+    aggregate, DistinctCount, MatchCount, CategoryCounts, CategoryTable, TopCounts,
+    CountRanges, RatioBins, EqualWidthBins, QuantileBins, Scatter, KaplanMeier,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever compute_summary changes its output so old snapshots are ignored
+SNAPSHOT_VERSION = 3
+
+metadata = MetaData()
+
+summary_snapshot = Table(
+    'summary_snapshot', metadata,
+    Column('dataset', String(255), primary_key=True),
+    Column('version', Integer, nullable=False),
+    Column('created_at', DateTime, nullable=False),
+    Column('payload', LargeBinary().with_variant(LONGBLOB, 'mysql'), nullable=False),  # zlib-compressed JSON
+)
+
+
+PATIENT_SPECS = [
+    DistinctCount('patients', 'patient_id'),
+    DistinctCount('living', 'patient_id', where=('os_status', '0:LIVING')),
+    DistinctCount('deceased', 'patient_id', where=('os_status', '1:DECEASED')),
+    MatchCount('male', 'sex', 'male'),
+    MatchCount('female', 'sex', 'female'),
+    CategoryCounts('raceCategory', 'race'),
+    CategoryCounts('ethnicityCategory', 'ethnicity'),
+    CategoryCounts('ajccMetastasis', 'pharmaceutical_tx_adjuvant'),
+    CategoryCounts('ajccPublication', 'ajcc_metastasis_pathologic_pm'),
+    CategoryCounts('ajccTumor', 'ajcc_staging_edition'),
+    EqualWidthBins('birthFromDiagnosis', 'days_to_birth'),
+    EqualWidthBins('daysToFollowup', 'days_to_last_followup'),
+    QuantileBins('deathFromDiagnosis', 'days_to_death'),
+    KaplanMeier('kmOverall', 'os'),
+    KaplanMeier('kmDiseaseFree', 'dfs'),
+]
+
+SAMPLE_SPECS = [
+    DistinctCount('samples', 'id'),
+    MatchCount('primary', 'sample_type', 'primary'),
+    MatchCount('metastasis', 'sample_type', 'primary', negate=True),
+    CategoryTable('cancerTypeDetailed', 'cancer_type_detailed', "# (Number of Samples)"),
+]
+
+MUTATION_SPECS = [
+    # Assuming you have a way to determine the mutation type (e.g., "Missense", "Frameshift") for each gene
+    TopCounts('mutatedGenes', 'hugo_symbol', 50,
+              ["Gene", "Mutation (Mut)", "# (Count)", "Frequency (%)"],
+              lambda gene, count, frequency: {
+                  "Gene": gene,
+                  "Mutation (Mut)": "Missense",
+                  "# (Count)": count,
+                  "Frequency (%)": f"{frequency:.1f}"
+              }),
+    CountRanges('mutationCount', 'hugo_symbol', [10, 20, 30, 40]),
+    Scatter('mutationVsFraction', 't_ref_count', 't_alt_count', "mutationCount", "fractionGenomeAltered", 100),
+]
+
+GISTIC_SPECS = [
+    RatioBins('fractionGenomicAltered', 'n_genes_in_peak', 'n_genes_in_region'),
+]
+
+
+def _inspector(db):
+    # Works for both sessions (request path) and connections (dataloader)
+    return inspect(db.get_bind() if hasattr(db, 'get_bind') else db)
+
+
+def _table_columns(inspector, tables, table):
+    """Column names of table, or an empty set if the dataset does not have it"""
+    if table not in tables:
+        return set()
+    return {column['name'] for column in inspector.get_columns(table)}
+
+
+# One scan per table; the charts of the page are computed from these
+SCAN_SECTIONS = {
+    'patient': ("_data_clinical_patient", PATIENT_SPECS),
+    'sample': ("_data_clinical_sample", SAMPLE_SPECS),
+    'mutations': ("_data_mutations", MUTATION_SPECS),
+    'gistic': ("_data_gistic_genes_amp", GISTIC_SPECS),
+}
+
+
+def scan_section(db, dataset_name, name):
+    """Evaluate a scan section's chart specs against one read of its table"""
+    suffix, specs = SCAN_SECTIONS[name]
+    inspector = _inspector(db)
+    table = dataset_name + suffix
+    return aggregate(db, table, specs, available=_table_columns(inspector, inspector.get_table_names(), table))
+
+
+def genomic_profile_section(db, dataset_name):
+    """(label, row count) of every molecular profile of the dataset"""
+    tables = _inspector(db).get_table_names()
+
+    # Row count of each profile table; matrix files live in the array store, where
+    # their row count is the number of genes indexed for the profile
+    profile_counts = {}
+    for table in tables:
+        if table.startswith(dataset_name):
+            profile_counts[table] = None
+    if 'array_gene_index' in tables:
+        for profile, count in db.execute(text(
+            "SELECT profile, COUNT(*) FROM array_gene_index WHERE dataset = :dataset GROUP BY profile"
+        ), {"dataset": dataset_name}).fetchall():
+            profile_counts[f"{dataset_name}_{profile}"] = count
+
+    # Filter table names
+    filtered_tables = [ table for table in profile_counts if not any(excluded in table for excluded in ["meta", "cases", "sample", "patient"])]
+
+    rep = {dataset_name: "", "data": "", "_": " "}
+    table_new = [re.sub("|".join(rep.keys()), lambda m: rep[m.group()], table) for table in filtered_tables]
+
+    # Get row count for each table
+    profiles = []
+    for table, t in zip(filtered_tables, table_new):
+        row_count = profile_counts[table]
+        if row_count is None:
+            count_result = db.execute(text(f"SELECT COUNT(*) FROM {table}")).fetchone()
+            row_count = count_result[0] if count_result else 0  # Use row[0] to access count
+        profiles.append((t.strip(), row_count))
+    return profiles
+
+
+def cna_genes_section(db, dataset_name):
+    """Top rows of the shared cna_gene table, if it was loaded"""
+    if 'cna_gene' not in _inspector(db).get_table_names():
+        return []
+    return [dict(row) for row in db.execute(text(
+        "SELECT gene, cytoband, CNA, num, freq FROM cna_gene ORDER BY num DESC LIMIT 100"
+    )).mappings().all()]
+
+
+# Independent parts of the summary page, each computed from its own queries
+SECTIONS = {
+    **{name: partial(scan_section, name=name) for name in SCAN_SECTIONS},
+    'genomicProfile': genomic_profile_section,
+    'cnaGenes': cna_genes_section,
+}
+
+
+def empty_section(name):
+    """The result of a section with no data: empty charts"""
+    if name in SCAN_SECTIONS:
+        return aggregate(None, None, SCAN_SECTIONS[name][1], available=set())
+    return []
+
+
+def compute_summary(db, dataset_name):
+    """Compute the full summary page payload for a dataset, one section after another.
+
+    Tables or columns a dataset does not have give empty charts.
+    """
+    return assemble_summary({name: section(db, dataset_name) for name, section in SECTIONS.items()})
+
+
+# Shared by all requests, so concurrent summaries cannot exhaust the connection pool
+_section_pool = None
+_section_pool_lock = threading.Lock()
+
+
+def _section_executor():
+    global _section_pool
+    with _section_pool_lock:
+        if _section_pool is None:
+            _section_pool = ThreadPoolExecutor(max_workers=Config.SUMMARY_WORKERS,
+                                               thread_name_prefix='summary-section')
+        return _section_pool
+
+
+def _run_section(engine, name, dataset_name):
+    # Each section checks out its own pooled connection
+    with engine.connect() as conn:
+        return SECTIONS[name](conn, dataset_name)
+
+
+def compute_summary_concurrent(engine, dataset_name, deadline=None):
+    """compute_summary with the sections run concurrently on a bounded thread pool.
+
+    Sections that fail, or are still running after deadline seconds, give empty
+    charts. Returns (payload, errors) where errors maps those sections to a message.
+    """
+    if deadline is None:
+        deadline = Config.SUMMARY_DEADLINE
+    start = time.perf_counter()
+    executor = _section_executor()
+    # Each section runs in a copy of the request context, so its SQL time is attributed to the request
+    futures = {name: executor.submit(copy_context().run, _run_section, engine, name, dataset_name)
+               for name in SECTIONS}
+    done, _ = wait(futures.values(), timeout=deadline)
+
+    sections, errors = {}, {}
+    for name, future in futures.items():
+        if future not in done:
+            # A section that already started keeps its worker until it finishes
+            future.cancel()
+            errors[name] = f"timed out after {deadline:g}s"
+        elif future.exception() is not None:
+            errors[name] = str(future.exception())
+        else:
+            sections[name] = future.result()
+            continue
+        logger.warning(f"Summary section {name} of {dataset_name}: {errors[name]}")
+        sections[name] = empty_section(name)
+
+    logger.info(f"Computed summary of {dataset_name} in {time.perf_counter() - start:.2f}s "
+                f"({len(SECTIONS) - len(errors)}/{len(SECTIONS)} sections)")
+    return assemble_summary(sections), errors
+
+
+def assemble_summary(sections):
+    """Lay out the summary page payload from the section results"""
+    # Create an empty response object
+    response_data = {}
+    patient, sample, mutations, gistic = sections['patient'], sections['sample'], sections['mutations'], sections['gistic']
+
+    # ===== PIE CHARTS =====
+
+    # 1. Samples and Patients
+    response_data['samplesPerPatient'] = [
+        {"category": "Samples", "value": sample['samples']},
+        {"category": "Patients", "value": patient['patients']}
+    ]
+
+    # 2. Overall Survival Status
+    response_data['overallSurvivalStatus'] = [
+        {"category": "Living", "value": patient['living']},
+        {"category": "Deceased", "value": patient['deceased']}
+    ]
+
+    # 3. Sample Type
+    response_data['sampleType'] = [
+        {"category": "Primary", "value": sample['primary']},
+        {"category": "Metastasis", "value": sample['metastasis']}
+    ]
+
+    # 4. Sex
+    response_data['sex'] = [
+        {"category": "Female", "value": patient['female']},
+        {"category": "Male", "value": patient['male']}
+    ]
+
+    # 5. Race Category
+    response_data['raceCategory'] = patient['raceCategory']
+
+    # 6. Ethinicity Category
+    response_data["ethnicityCategory"] = patient['ethnicityCategory']
+
+    # 7. Adjuvant Postoperative Pharmaceutical Therapy
+    # TODO: Replace with your database query
+    response_data['adjuvantTherapy'] = [
+        {"category": "NA", "value": 100},
+        {"category": "Yes", "value": 90},
+        {"category": "No", "value": 30}
+    ]
+
+    # 8. American Joint Committee on Cancer Metastasis
+    response_data["ajccMetastasis"] = patient['ajccMetastasis']
+
+    # 9. American Joint Committee on Cancer Publication
+    response_data["ajccPublication"] = patient['ajccPublication']
+
+    # 10. American Joint Committee on Cancer Tumor
+    response_data["ajccTumor"] = patient['ajccTumor']
+
+    # ===== TABLES =====
+
+    # 1. Genomic Profile Sample Counts
+
+    # Initialize genomicProfile structure
+    response_data["genomicProfile"] = {
+        "columns": ["Molecular Profile", "# (Count)", "Frequency (%)"],
+        "rows": []
+    }
+
+    total_rows = 0
+    table_data = []
+
+    for profile, row_count in sections['genomicProfile']:
+        total_rows += row_count
+        table_data.append({"Molecular Profile": profile, "# (Count)": row_count})
+
+    # Calculate frequency
+    for entry in table_data:
+        entry["Frequency (%)"] = f"{round((entry['# (Count)'] / total_rows) * 100, 1) if total_rows > 0 else 0}"
+        response_data["genomicProfile"]["rows"].append(entry)
+
+    # 2. Cancer Type Detailed
+    response_data['cancerTypeDetailed'] = sample['cancerTypeDetailed']
+
+    # 3. Mutated Genes
+    response_data['mutatedGenes'] = mutations['mutatedGenes']
+
+    # 4. CNA Genes
+    result = sections['cnaGenes']
+
+    response_data['cnaGenes'] = {
+        "columns": ["Gene Cytoband", "CNA", "# (Count)", "Frequency (%)"],
+        "rows": []
+    }
+
+    for row in result:
+        response_data['cnaGenes']["rows"].append({
+            "Gene Cytoband": f"{row['gene']} {row['cytoband']}",
+            "CNA": row["CNA"],
+            "# (Count)": row["num"],
+            "Frequency (%)": f"{row['freq']:.1f}"
+        })
+
+    # 5. Brachytherapy First Reference Point Administered Total Dose
+    # TODO: Replace with your database query
+    response_data['brachytherapy'] = {
+        "columns": ["Category", "# (Count)", "Frequency (%)"],
+        "rows": [
+            {"Category": "NA", "# (Count)": 180, "Frequency (%)": "81.8"},
+            {"Category": "40-50 Gy", "# (Count)": 25, "Frequency (%)": "11.4"},
+            {"Category": "30-40 Gy", "# (Count)": 15, "Frequency (%)": "6.8"}
+        ]
+    }
+
+    # 6. Cent17 Copy Number
+    # TODO: Replace with your database query
+    response_data['cent17CopyNumber'] = {
+        "columns": ["Category", "# (Count)", "Frequency (%)"],
+        "rows": [
+            {"Category": "NA", "# (Count)": 160, "Frequency (%)": "72.7"},
+            {"Category": "2", "# (Count)": 30, "Frequency (%)": "13.6"},
+            {"Category": "3", "# (Count)": 20, "Frequency (%)": "9.1"},
+            {"Category": "4+", "# (Count)": 10, "Frequency (%)": "4.5"}
+        ]
+    }
+
+    # ===== BAR CHARTS =====
+
+    # 1. Mutation Count
+    response_data['mutationCount'] = mutations['mutationCount']
+
+    # 2. Fraction Genomic Altered
+    response_data['fractionGenomicAltered'] = gistic['fractionGenomicAltered']
+
+    # 3. Birth from Initial Pathologic Diagnosis Date
+    response_data['birthFromDiagnosis'] = patient['birthFromDiagnosis']
+
+    # 4. Days to Last Follow-up
+    response_data['daysToFollowup'] = patient['daysToFollowup']
+
+    # 5. Death from Initial Pathologic Diagnosis Date
+    response_data['deathFromDiagnosis'] = patient['deathFromDiagnosis']
+
+    # ===== DOT PLOTS =====
+
+    # 1. Mutation Count vs Fraction Genome Altered
+    response_data['mutationVsFraction'] = mutations['mutationVsFraction']
+
+    # 2. KM Plot: Overall (months)
+    response_data['kmOverall'] = patient['kmOverall']
+
+    # 3. KM Plot: Disease Free (months)
+    response_data['kmDiseaseFree'] = patient['kmDiseaseFree']
+
+    return response_data
+
+
+def ensure_snapshot_table(bind):
+    metadata.create_all(bind, tables=[summary_snapshot], checkfirst=True)
+
+
+def load_snapshot(db, dataset_name):
+    """Return the stored summary of a dataset, or None if missing or outdated"""
+    row = db.execute(
+        summary_snapshot.select().where(summary_snapshot.c.dataset == dataset_name)
+    ).mappings().first()
+    if row is None or row['version'] != SNAPSHOT_VERSION:
+        return None
+    return json.loads(zlib.decompress(row['payload']))
+
+
+def store_snapshot(db, dataset_name, payload):
+    """Replace the stored summary of a dataset (caller commits)"""
+    blob = zlib.compress(json.dumps(payload, separators=(',', ':')).encode('utf-8'))
+    db.execute(summary_snapshot.delete().where(summary_snapshot.c.dataset == dataset_name))
+    db.execute(summary_snapshot.insert().values(
+        dataset=dataset_name,
+        version=SNAPSHOT_VERSION,
+        created_at=datetime.utcnow(),
+        payload=blob,
+    ))
+    logger.info(f"Stored summary snapshot for {dataset_name} ({len(blob)} bytes)")
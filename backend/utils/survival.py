@@ -0,0 +1,183 @@
+import threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+from scipy import stats
+from utils.instrumentation import stage
+
+# Survival endpoints: (months column, status column, status value that counts as an event)
+ENDPOINTS = {
+    'os': ('OS_MONTHS', 'OS_STATUS', '1:DECEASED'),
+    'dfs': ('DFS_MONTHS', 'DFS_STATUS', '1:Recurred/Progressed'),
+}
+
+
+def kaplan_meier(durations, events, alpha=0.05):
+    """Kaplan-Meier estimate in one pass over the distinct times.
+
+    Returns a dict of arrays over the timeline (starting at 0): time, at_risk,
+    events, censored, survival and the log(-log) Greenwood confidence band.
+    """
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=bool)
+
+    if len(durations) == 0:
+        # Nothing to estimate; an empty curve rather than a NaN point at 0
+        empty = np.empty(0)
+        return {'time': empty, 'at_risk': empty.astype(int), 'events': empty.astype(int),
+                'censored': empty.astype(int), 'survival': empty, 'lower': empty, 'upper': empty}
+
+    times, inverse = np.unique(durations, return_inverse=True)
+    total = np.bincount(inverse, minlength=len(times))
+    deaths = np.bincount(inverse, weights=events, minlength=len(times))
+    censored = total - deaths
+    at_risk = len(durations) - np.concatenate(([0], np.cumsum(total)[:-1]))
+
+    if len(times) == 0 or times[0] > 0:
+        # The curve always starts at time 0 with everybody at risk
+        times = np.concatenate(([0.0], times))
+        at_risk = np.concatenate(([len(durations)], at_risk))
+        deaths = np.concatenate(([0], deaths))
+        censored = np.concatenate(([0], censored))
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        survival = np.cumprod(1.0 - deaths / at_risk)
+        greenwood = np.cumsum(deaths / (at_risk * (at_risk - deaths)))
+
+        z = stats.norm.ppf(1 - alpha / 2)
+        log_s = np.log(survival)
+        spread = z * np.sqrt(greenwood) / log_s
+        lower = np.exp(-np.exp(np.log(-log_s) - spread))
+        upper = np.exp(-np.exp(np.log(-log_s) + spread))
+
+    # No events yet (S = 1) or nobody left (S = 0): the band collapses onto S
+    degenerate = (survival == 1) | (survival == 0)
+    lower = np.where(degenerate, survival, lower)
+    upper = np.where(degenerate, survival, upper)
+
+    return {
+        'time': times,
+        'at_risk': at_risk.astype(int),
+        'events': deaths.astype(int),
+        'censored': censored.astype(int),
+        'survival': survival,
+        'lower': lower,
+        'upper': upper,
+    }
+
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def km_points(curve):
+    """Curve arrays -> the [{time, survival, censored, ...}] list used by the frontend"""
+    return [{
+        "time": float(time),
+        "survival": float(survival),
+        "censored": bool(censored > 0),
+        "atRisk": int(at_risk),
+        "lower": _finite(lower),
+        "upper": _finite(upper),
+    } for time, survival, censored, at_risk, lower, upper in zip(
+        curve['time'], curve['survival'], curve['censored'],
+        curve['at_risk'], curve['lower'], curve['upper'])]
+
+
+def logrank_test(durations, events, groups):
+    """Multi-group log-rank test; returns statistic, degrees of freedom and p-value"""
+    durations = np.asarray(durations, dtype=float)
+    events = np.asarray(events, dtype=float)
+    labels, group_idx = np.unique(np.asarray(groups), return_inverse=True)
+    k = len(labels)
+    if k < 2:
+        return None
+
+    times, time_idx = np.unique(durations, return_inverse=True)
+    deaths = np.zeros((len(times), k))
+    counts = np.zeros((len(times), k))
+    np.add.at(deaths, (time_idx, group_idx), events)
+    np.add.at(counts, (time_idx, group_idx), 1)
+
+    # Subjects at risk at time t are those with duration >= t
+    at_risk = np.cumsum(counts[::-1], axis=0)[::-1]
+    n = at_risk.sum(axis=1)
+    d = deaths.sum(axis=1)
+
+    keep = (d > 0) & (n > 1)
+    at_risk, deaths, n, d = at_risk[keep], deaths[keep], n[keep], d[keep]
+
+    observed_minus_expected = (deaths - at_risk * (d / n)[:, None]).sum(axis=0)
+    weight = d * (n - d) / (n ** 2 * (n - 1))
+    variance = np.einsum('t,tj,jl->jl', weight * n, at_risk, np.eye(k)) - np.einsum('t,tj,tl->jl', weight, at_risk, at_risk)
+
+    u = observed_minus_expected[:-1]
+    statistic = float(u @ np.linalg.pinv(variance[:-1, :-1]) @ u)
+    dof = k - 1
+    return {
+        "statistic": statistic,
+        "df": dof,
+        "p_value": float(stats.chi2.sf(statistic, dof)),
+    }
+
+
+@stage('km_fit')
+def stratified_survival(frame, endpoint, groups=None):
+    """KM curves for a patient-level frame, overall and per group, plus a log-rank test.
+
+    frame holds the clinical columns of ENDPOINTS[endpoint]; groups is an
+    optional array aligned with frame giving each patient's stratum.
+    """
+    months_col, status_col, event_value = ENDPOINTS[endpoint]
+    durations = pd.to_numeric(frame[months_col], errors='coerce').to_numpy(dtype=float)
+    events = frame[status_col].to_numpy() == event_value
+    keep = ~np.isnan(durations)
+
+    result = {
+        "endpoint": endpoint,
+        "sample_count": int(keep.sum()),
+        "kmData": km_points(kaplan_meier(durations[keep], events[keep])),
+    }
+    if groups is None:
+        return result
+
+    groups = pd.Series(np.asarray(groups, dtype=object))
+    keep &= groups.notna().to_numpy()
+    durations, events, groups = durations[keep], events[keep], groups[keep].astype(str).to_numpy()
+
+    result["groups"] = []
+    for label in np.unique(groups):
+        in_group = groups == label
+        result["groups"].append({
+            "name": label,
+            "count": int(in_group.sum()),
+            "events": int(events[in_group].sum()),
+            "kmData": km_points(kaplan_meier(durations[in_group], events[in_group])),
+        })
+    result["logRank"] = logrank_test(durations, events, groups)
+    return result
+
+
+class ResultCache:
+    """Small thread-safe LRU cache for computed results"""
+
+    def __init__(self, maxsize=256):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = compute()
+        with self._lock:
+            self._entries[key] = value
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        return value
+
+
+# Keyed by (dataset, endpoint, strata, data version)
+survival_cache = ResultCache()
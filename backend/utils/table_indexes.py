@@ -0,0 +1,79 @@
+import os
+import time
+import hashlib
+import logging
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Columns the routes filter, join or group on, by file type prefix (case list
+# files create a <dataset>_cases_<stable_id> table, declared under 'case_list')
+INDEX_DECLARATIONS = {
+    'data_clinical_patient': ['patient_id', 'os_status', 'dfs_status', 'sex', 'race', 'ethnicity'],
+    'data_clinical_sample': ['patient_id', 'sample_id', 'sample_type', 'cancer_type', 'cancer_type_detailed'],
+    'data_mutations': ['hugo_symbol', 'tumor_sample_barcode', 'variant_classification'],
+    'case_list': ['case_id'],
+}
+
+# String columns with at most this many distinct values are indexed as well
+LOW_CARDINALITY_MAX = int(os.environ.get('INDEX_LOW_CARDINALITY_MAX', 64))
+
+# Wide (gene x sample) tables only get their declared indexes
+AUTO_INDEX_MAX_COLUMNS = 200
+
+
+def declared_columns(file_type):
+    columns = []
+    for prefix, declared in INDEX_DECLARATIONS.items():
+        if file_type.startswith(prefix):
+            columns.extend(col for col in declared if col not in columns)
+    return columns
+
+
+def low_cardinality_columns(sample, kinds):
+    """String columns of sample that look like categories (a few values, repeated)"""
+    if len(sample.columns) > AUTO_INDEX_MAX_COLUMNS:
+        return []
+    columns = []
+    for col, kind in kinds.items():
+        if kind != 'string':
+            continue
+        distinct = sample[col].nunique()
+        if 2 <= distinct <= LOW_CARDINALITY_MAX and distinct * 2 <= len(sample):
+            columns.append(col)
+    return columns
+
+
+def index_columns(file_type, sample, kinds):
+    """Columns to index: the declared ones present in the table, then detected categories.
+
+    kinds maps each column to its dataloader column kind; TEXT columns are never
+    indexed (MySQL needs a prefix length for them).
+    """
+    columns = [col for col in declared_columns(file_type) if kinds.get(col, 'text') != 'text']
+    columns.extend(col for col in low_cardinality_columns(sample, kinds) if col not in columns)
+    return columns
+
+
+def index_name(table_name, column):
+    # Index names are global in SQLite and PostgreSQL and survive the shadow-table
+    # rename, so every build gets a fresh suffix
+    digest = hashlib.sha1(f"{table_name}.{column}.{time.time_ns()}".encode('utf-8')).hexdigest()[:10]
+    return f"ix_{column[:48]}_{digest}"
+
+
+def build_indexes(engine, table_name, columns):
+    """Create one single-column index per column; logs each build time and returns the total"""
+    quote = engine.dialect.identifier_preparer.quote
+    total = 0.0
+    for column in columns:
+        start = time.perf_counter()
+        with engine.begin() as conn:
+            conn.execute(text(f"CREATE INDEX {quote(index_name(table_name, column))} "
+                              f"ON {quote(table_name)} ({quote(column)})"))
+        seconds = time.perf_counter() - start
+        total += seconds
+        logger.info(f"Indexed {table_name}.{column} in {seconds:.2f}s")
+    if columns:
+        logger.info(f"Built {len(columns)} indexes on {table_name} in {total:.2f}s")
+    return total
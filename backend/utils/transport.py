@@ -0,0 +1,76 @@
+import base64
+import hashlib
+import json
+import numpy as np
+from flask import Response, jsonify, request
+from utils.instrumentation import stage
+
+# Quantized matrix encodings: value = q * scale + offset
+MATRIX_DTYPES = ('int8', 'float16')
+INT8_NAN = -128  # reserved code for missing values
+
+
+def quantize(z, dtype='int8'):
+    """Encode a 2-D float matrix as little-endian bytes plus the metadata to decode it"""
+    z = np.asarray(z, dtype=np.float32)
+    meta = {"shape": list(z.shape), "dtype": dtype}
+
+    if dtype == 'float16':
+        meta.update(scale=1.0, offset=0.0)
+        return z.astype('<f2').tobytes(), meta
+
+    finite = z[np.isfinite(z)]
+    low = float(finite.min()) if finite.size else 0.0
+    high = float(finite.max()) if finite.size else 0.0
+    # Codes -127..127 span [low, high]; -128 marks NaN
+    scale = (high - low) / 254 or 1.0
+    with np.errstate(invalid='ignore'):
+        codes = np.rint((z - low) / scale) - 127
+    codes = np.where(np.isfinite(z), codes, INT8_NAN).astype(np.int8)
+    meta.update(scale=scale, offset=low + 127 * scale, nan=INT8_NAN)
+    return codes.tobytes(), meta
+
+
+def dequantize(data, meta):
+    """Inverse of quantize, for Python clients"""
+    if meta['dtype'] == 'float16':
+        return np.frombuffer(data, dtype='<f2').astype(np.float32).reshape(meta['shape'])
+    codes = np.frombuffer(data, dtype=np.int8).reshape(meta['shape'])
+    values = codes.astype(np.float32) * meta['scale'] + meta['offset']
+    return np.where(codes == meta['nan'], np.nan, values)
+
+
+@stage('serialize')
+def matrix_response(z, dtype='int8', binary=False, extra=None):
+    """Quantized matrix as JSON with base64 data, or as application/octet-stream with X-Matrix-* headers"""
+    data, meta = quantize(z, dtype)
+    meta.update(extra or {})
+    if binary:
+        headers = {f"X-Matrix-{key.title()}": json.dumps(value) for key, value in meta.items()}
+        # The frontend runs on another origin; without this browsers hide the metadata headers
+        headers['Access-Control-Expose-Headers'] = ', '.join(headers)
+        return Response(data, mimetype='application/octet-stream', headers=headers)
+    meta["data"] = base64.b64encode(data).decode('ascii')
+    return jsonify(meta)
+
+
+def labels_version(rows, cols):
+    """Stable tag for a pair of label lists; used as the ETag of the labels endpoint"""
+    digest = hashlib.sha1()
+    digest.update('\n'.join(map(str, rows)).encode('utf-8'))
+    digest.update(b'\0')
+    digest.update('\n'.join(map(str, cols)).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def labels_response(rows, cols, max_age=3600, dendrograms=None):
+    """Row and column labels with an ETag so clients can cache them across matrix requests"""
+    version = labels_version(rows, cols)
+    body = {"rows": list(rows), "cols": list(cols), "version": version}
+    if dendrograms is not None:
+        body["dendrograms"] = dendrograms
+    response = jsonify(body)
+    response.set_etag(version)
+    response.cache_control.public = True
+    response.cache_control.max_age = max_age
+    return response.make_conditional(request)